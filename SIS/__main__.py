@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the modules import each other by bare name, the same as when main.py runs from this directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cli
+
+sys.exit(cli.main())
@@ -0,0 +1,260 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SIZES = (1000, 10000, 100000, 1000000)
+
+# a result must be this much slower than the baseline (and by at least MIN_DELTA seconds) to count
+THRESHOLD = 0.25
+MIN_DELTA = 0.001
+
+COLLEGES = [
+    ('CCS', 'College of Computer Studies',
+     ['BSCS', 'BSIT', 'BSIS', 'BSCA']),
+    ('COE', 'College of Engineering',
+     ['BSCE', 'BSEE', 'BSME', 'BSCHE', 'BSCPE', 'BSECE', 'BSMETE', 'BSCERE']),
+    ('CSM', 'College of Science and Mathematics',
+     ['BSBIO', 'BSCHEM', 'BSMATH', 'BSPHYS', 'BSSTAT', 'BSMB', 'BSES']),
+    ('CASS', 'College of Arts and Social Sciences',
+     ['BAHIST', 'BAPOLSCI', 'BAPSYCH', 'BAENG', 'BAFIL', 'BASOC', 'BAPHIL']),
+    ('CEBA', 'College of Economics Business and Accountancy',
+     ['BSA', 'BSBAMM', 'BSBAFM', 'BSECON', 'BSHM', 'BSENTREP']),
+    ('CED', 'College of Education',
+     ['BEED', 'BSEDMATH', 'BSEDSCI', 'BSEDENG', 'BTLED', 'BPED']),
+    ('CHS', 'College of Health Sciences',
+     ['BSN', 'BSMT', 'BSPT', 'BSPHARMA']),
+]
+
+FIRST_NAMES = """Juan Maria Jose Ana Pedro Luz Carlos Rosa Miguel Elena Andres Teresa Antonio Carmen
+Rafael Isabel Manuel Josefa Francisco Lourdes Ramon Cristina Fernando Angelica Emilio Patricia
+Gabriel Veronica Ricardo Beatriz Eduardo Gloria Roberto Marites Enrique Rowena Alfredo Jocelyn
+Mark John Paul Kevin Christian Angela Nicole Kimberly Jasmine Princess Joshua Daniel Justin
+Bea Kyla Ivan Renz Jerome Marvin Aira Trisha Erika Mae Joy Grace Faith Hope Lyka Janelle""".split()
+
+LAST_NAMES = """Dela Cruz|Santos|Reyes|Garcia|Mendoza|Torres|Flores|Villanueva|Ramos|Castro|Rivera|Aquino
+|Bautista|Gonzales|Fernandez|Lopez|Perez|Cruz|Navarro|Mercado|Domingo|Pascual|Salazar|Castillo
+|Del Rosario|De Leon|Valdez|Soriano|Aguilar|Marquez|Manalo|Lim|Tan|Sy|Go|Ong|Chua|Dizon|Tolentino
+|Ocampo|Samonte|Sarmiento|Panganiban|Macaraeg|Magbanua|Lacson|Evangelista|Javier|Fajardo""".replace('\n', '').split('|')
+
+def generate(directory, students, seed=0):
+    """Write colleges.csv, programs.csv and students.csv with this many students into directory."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    programs = []
+    with open(os.path.join(directory, 'colleges.csv'), mode = 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['code', 'name'])
+        for code, name, program_codes in COLLEGES:
+            writer.writerow([code, name])
+            programs.extend((p, code) for p in program_codes)
+
+    with open(os.path.join(directory, 'programs.csv'), mode = 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['code', 'name', 'college_code'])
+        for code, college in programs:
+            writer.writerow([code, f"Bachelor of {code[2:] if code.startswith('BS') else code}", college])
+
+    # popular programs get many more students than the rest
+    codes = [code for code, _ in programs]
+    weights = [rng.paretovariate(1.5) for _ in codes]
+    # ids are YYYY-NNNN, so anything past 10k students spills into earlier years
+    with open(os.path.join(directory, 'students.csv'), mode = 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'firstname', 'lastname', 'program_code', 'year', 'gender'])
+        chosen = rng.choices(codes, weights, k=students)
+        for i in range(students):
+            writer.writerow([f"{2025 - i // 10000:04d}-{i % 10000:04d}",
+                             rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), chosen[i],
+                             rng.choice('1111222334'), rng.choice(('Male', 'Female'))])
+
+def timed(fn, repeat=1):
+    """Best wall time of repeat calls, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def per_call(fn, args):
+    """Average wall time of fn(arg) over args, in seconds."""
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / max(1, len(args))
+
+def run_size(dh, directory, students, repeat=3, ops=100):
+    """Time every operation on a generated table of this size; returns {name: seconds}."""
+    generate(directory, students)
+    path = lambda name: os.path.join(directory, name)
+    open_students = lambda: dh.open_table(path('students.csv'), dh.STUDENT_FIELDS, **dh.STUDENT_OPTIONS)
+    programs = dh.open_table(path('programs.csv'), dh.PROGRAM_FIELDS, **dh.PROGRAM_OPTIONS)
+    rng = random.Random(students)
+    results = {}
+
+    # the first load parses the csv, later fresh handlers can use the snapshot it leaves behind
+    results['load_data_cold'] = timed(lambda: open_students().load_data())
+    results['load_data_reopen'] = timed(lambda: open_students().load_data(), repeat)
+    # a page from the far end of a fresh handler, read through the row index
+    results['load_page_last'] = timed(lambda: open_students().load_page(max(0, students - 50), 50), repeat)
+    table = open_students()
+    records = table.load_data()
+    results['load_data_cached'] = timed(table.load_data, repeat)
+    results['count'] = timed(table.count, repeat)
+    results['save_data'] = timed(lambda: table.save_data(records), repeat)
+
+    sample = rng.sample(records, min(ops, len(records)))
+    keys = [r['id'] for r in sample]
+    results['search_first'] = timed(lambda: table.search(sample[0]['lastname'][:4]))
+    results['search'] = per_call(table.search, [r['id'][2:] for r in sample[:10]] + ['cruz', 'ang', 'xyz'])
+
+    for field in ('id', 'lastname', 'year'):
+        results[f'sort_{field}'] = timed(lambda: table.sorted_records(field))
+        results[f'sort_{field}_cached'] = timed(lambda: table.sorted_records(field, reverse=True), repeat)
+
+    facets = {'gender': ['Female'], 'year': ['1', '2']}
+    results['filter'] = timed(lambda: table.filter(facets))
+    results['filter_cached'] = timed(lambda: table.filter(facets), repeat)
+    results['filter_programs'] = timed(lambda: table.filter({'program_code': ['BSCS', 'BSIT']}), repeat)
+
+    # referential checks: the lookups behind add and the delete protection of programs
+    results['exists'] = per_call(table.exists, keys)
+    program_codes = [p['code'] for p in programs.load_data()]
+    results['has_references'] = per_call(lambda code: table.has_references('program_code', code), program_codes)
+    results['referencing'] = per_call(lambda code: programs.referencing('college_code', code),
+                                      [c[0] for c in COLLEGES])
+
+    added = [{'id': f"1900-{i:04d}", 'firstname': 'Bench', 'lastname': 'Mark', 'program_code': 'BSCS',
+              'year': '1', 'gender': 'Male'} for i in range(len(keys))]
+    results['insert'] = per_call(table.insert, added)
+    results['update'] = per_call(table.update, [dict(r, year='4') for r in added])
+    results['delete'] = per_call(table.delete, [r['id'] for r in added])
+
+    return {name: round(seconds, 6) for name, seconds in results.items()}
+
+def run(sizes, repeat=3):
+    """Run the suite at each size in a scratch directory and return the report dict."""
+    scratch = tempfile.mkdtemp(prefix='sis-bench-')
+    cwd = os.getcwd()
+    database = os.environ.get('SIS_DATABASE')
+    try:
+        # data_handler opens the app's tables in the working directory on import
+        os.chdir(scratch)
+        import data_handler as dh
+        results = {}
+        for size in sizes:
+            directory = os.path.join(scratch, str(size))
+            # a fresh database per size when benchmarking the sqlite backend
+            os.environ['SIS_DATABASE'] = os.path.join(directory, 'sis.db')
+            print(f"benchmarking {size} students...", file=sys.stderr)
+            results[str(size)] = run_size(dh, directory, size, repeat)
+            shutil.rmtree(directory, ignore_errors=True)
+        backend = dh.storage_config()[0]
+    finally:
+        if database is None:
+            os.environ.pop('SIS_DATABASE', None)
+        else:
+            os.environ['SIS_DATABASE'] = database
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': backend,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+def compare(report, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """Return [(size, name, baseline seconds, new seconds)] for every result that got slower.
+
+    A result regressed if it is more than threshold (a fraction) slower than
+    the baseline and by more than min_delta seconds, so micro-timings
+    jittering by a few microseconds aren't flagged.
+    """
+    regressions = []
+    for size, results in report['results'].items():
+        old_results = baseline['results'].get(size, {})
+        for name, seconds in results.items():
+            old = old_results.get(name)
+            if old is None:
+                continue
+            if seconds > old * (1 + threshold) and seconds - old > min_delta:
+                regressions.append((size, name, old, seconds))
+    return regressions
+
+def print_regressions(regressions):
+    if not regressions:
+        print("No regressions against the baseline.", file=sys.stderr)
+        return
+    print(f"{len(regressions)} regression(s) against the baseline:", file=sys.stderr)
+    for size, name, old, new in regressions:
+        print(f"  {size:>8} {name:<22} {old * 1000:10.3f} ms -> {new * 1000:10.3f} ms ({new / old:.2f}x)",
+              file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SIS data layer on generated tables.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_cmd = commands.add_parser('run', help="run the suite and print the results as JSON")
+    run_cmd.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                         help="comma-separated student counts (default: %(default)s)")
+    run_cmd.add_argument('--repeat', type=int, default=3, help="repeats for the fast operations, best one counts")
+    run_cmd.add_argument('--output', help="write the JSON report here instead of stdout")
+    run_cmd.add_argument('--baseline', help="JSON report to compare against; exits 1 on regressions")
+    run_cmd.add_argument('--threshold', type=float, default=THRESHOLD, help="allowed slowdown (default: %(default)s)")
+
+    compare_cmd = commands.add_parser('compare', help="compare two JSON reports")
+    compare_cmd.add_argument('report')
+    compare_cmd.add_argument('baseline')
+    compare_cmd.add_argument('--threshold', type=float, default=THRESHOLD, help="allowed slowdown (default: %(default)s)")
+
+    generate_cmd = commands.add_parser('generate', help="write a generated data set to a directory")
+    generate_cmd.add_argument('directory')
+    generate_cmd.add_argument('--students', type=int, default=SIZES[0])
+    generate_cmd.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        generate(args.directory, args.students, args.seed)
+        return 0
+
+    if args.command == 'compare':
+        with open(args.report) as f:
+            report = json.load(f)
+    else:
+        report = run([int(size) for size in args.sizes.split(',')], args.repeat)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+        if not args.baseline:
+            return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if report['meta'].get('backend') != baseline['meta'].get('backend'):
+        print(f"warning: comparing the {report['meta'].get('backend')} backend against "
+              f"a {baseline['meta'].get('backend')} baseline", file=sys.stderr)
+    regressions = compare(report, baseline, args.threshold)
+    print_regressions(regressions)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
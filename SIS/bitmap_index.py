@@ -0,0 +1,83 @@
+from itertools import compress
+
+# maps the ascii digits of a binary string to the bytes 0 and 1
+_BITS = bytes.maketrans(b'01', b'\x00\x01')
+
+class BitmapIndex:
+    """Per-value bitsets over a fixed list of records, for faceted filtering.
+
+    Bit i of a value's bitset is set when records[i] has that value (compared
+    case-insensitively). Bitsets are plain Python ints, so OR-ing the values
+    selected within a facet and AND-ing across facets runs in C. Bitsets are
+    built lazily per field, and the index is only valid for the list it was
+    built from; callers throw it away when the records change.
+    """
+    def __init__(self, records):
+        self.records = records
+        self.size = len(records)
+        self.all = (1 << self.size) - 1
+        self._values = {}   # field -> casefolded value per row
+        self._codes = {}    # field -> (value -> code, one code byte per row) for small fields
+        self._bitmaps = {}  # (field, value) -> int
+
+    def _column(self, field):
+        values = self._values.get(field)
+        if values is None:
+            values = self._values[field] = [str(r[field]).casefold() for r in self.records]
+        return values
+
+    def bitmap(self, field, value):
+        value = str(value).casefold()
+        bits = self._bitmaps.get((field, value))
+        if bits is not None:
+            return bits
+
+        values = self._column(field)
+        if field not in self._codes:
+            distinct = set(values)
+            if len(distinct) < 256:
+                mapping = {v: i + 1 for i, v in enumerate(distinct)}
+                self._codes[field] = (mapping, bytes(map(mapping.__getitem__, values)))
+            else:
+                self._codes[field] = None
+
+        coded = self._codes[field]
+        if coded is not None:
+            mapping, codes = coded
+            code = mapping.get(value)
+            if code is None:
+                bits = 0
+            else:
+                # one translate marks every row with this value, all in C
+                table = bytearray(b'0' * 256)
+                table[code] = ord('1')
+                bits = int(codes.translate(table)[::-1] or b'0', 2)
+        else:
+            flags = bytearray(b'0' * self.size)
+            for i, v in enumerate(values):
+                if v == value:
+                    flags[i] = ord('1')
+            bits = int(bytes(flags[::-1]) or b'0', 2)
+
+        self._bitmaps[(field, value)] = bits
+        return bits
+
+    def select(self, facets):
+        """Return the records matching every facet, in their original order.
+
+        facets maps a field to the values accepted for it; a record matches a
+        facet if its field equals any of them.
+        """
+        bits = self.all
+        for field, values in facets.items():
+            facet = 0
+            for value in values:
+                facet |= self.bitmap(field, value)
+            bits &= facet
+            if not bits:
+                return []
+
+        if bits == self.all:
+            return list(self.records)
+        flags = format(bits, 'b').zfill(self.size)[::-1].encode().translate(_BITS)
+        return list(compress(self.records, flags))
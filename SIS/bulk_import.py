@@ -0,0 +1,150 @@
+import argparse
+import csv
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# data_handler opens the tables relative to the working directory as it is
+# imported, so it is only imported in the parent; workers stick to validation
+from validation import validate_student_id
+
+# rows handed to a worker at a time
+CHUNK_SIZE = 20000
+
+def _check_chunk(rows, fieldnames, positions, program_codes):
+    """Validate one chunk of (line, row) pairs in a worker process.
+
+    Returns (accepted records, rejected (line, reason, row) tuples). Only
+    duplicates inside the chunk are caught here; the parent checks the
+    accepted ids against earlier chunks and the existing table.
+    """
+    width = max(positions) + 1
+    accepted = []
+    rejected = []
+    seen = set()
+    for line, row in rows:
+        if len(row) < width:
+            rejected.append((line, "Missing fields", row))
+            continue
+        record = {f: row[i].strip() for f, i in zip(fieldnames, positions)}
+        if not all(record.values()):
+            reason = "All fields required"
+        elif not validate_student_id(record['id']):
+            reason = "ID format must be YYYY-NNNN"
+        elif record['program_code'] not in program_codes:
+            reason = f"Program '{record['program_code']}' does not exist"
+        elif record['id'] in seen:
+            reason = "Duplicate ID in file"
+        else:
+            seen.add(record['id'])
+            accepted.append((line, record))
+            continue
+        rejected.append((line, reason, row))
+    return accepted, rejected
+
+def _chunks(reader, size):
+    while True:
+        chunk = [(reader.line_num, row) for row in islice(reader, size)]
+        if not chunk:
+            return
+        yield chunk
+
+def import_students(path, errors_path=None, chunk_size=CHUNK_SIZE, workers=None):
+    """Import the students in a CSV file, committing the valid ones in one write.
+
+    The file is read in chunks which a pool of worker processes validates
+    the same way the Add Student form does (required fields, id format,
+    existing program). Ids already in the table, or repeated within the
+    file, are rejected; the first copy in the file wins. Rejected rows are
+    streamed to errors_path (default: next to the input, with .errors.csv)
+    along with their line number and the reason.
+
+    Returns (accepted, rejected) counts.
+    """
+    import data_handler as dh
+
+    if errors_path is None:
+        errors_path = os.path.splitext(path)[0] + '.errors.csv'
+    # a report left by an earlier run would look like this run's rejects
+    if os.path.exists(errors_path):
+        os.remove(errors_path)
+    workers = workers or os.cpu_count() or 1
+    program_codes = frozenset(r['code'] for r in dh.program_db.load_data())
+    existing = {r['id'] for r in dh.student_db.load_data()}
+    seen = set()
+
+    accepted = []
+    rejected = 0
+    report = None
+    with open(path, mode = 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        missing = [field for field in dh.STUDENT_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"{path} is missing the column(s): {', '.join(missing)}")
+        positions = [header.index(field) for field in dh.STUDENT_FIELDS]
+
+        report_writer = None
+
+        def collect(result):
+            nonlocal rejected, report, report_writer
+            records, problems = result
+            problems = list(problems)
+            for line, record in records:
+                if record['id'] in seen or record['id'] in existing:
+                    reason = "Duplicate ID in file" if record['id'] in seen else "ID already exists"
+                    problems.append((line, reason, [record.get(h, '') for h in header]))
+                else:
+                    seen.add(record['id'])
+                    accepted.append(record)
+            if not problems:
+                return
+            if report_writer is None:
+                report = open(errors_path, mode = 'w', newline='')
+                report_writer = csv.writer(report)
+                report_writer.writerow(['line', 'reason'] + header)
+            for line, reason, row in sorted(problems, key=lambda p: p[0]):
+                report_writer.writerow([line, reason] + row)
+            rejected += len(problems)
+
+        try:
+            if workers <= 1:
+                for chunk in _chunks(reader, chunk_size):
+                    collect(_check_chunk(chunk, dh.STUDENT_FIELDS, positions, program_codes))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # bounded so the whole file never sits in the queue at once
+                    pending = deque()
+                    for chunk in _chunks(reader, chunk_size):
+                        pending.append(pool.submit(_check_chunk, chunk, dh.STUDENT_FIELDS, positions, program_codes))
+                        if len(pending) >= workers * 2:
+                            collect(pending.popleft().result())
+                    while pending:
+                        collect(pending.popleft().result())
+        finally:
+            if report is not None:
+                report.close()
+
+    if accepted:
+        dh.student_db.insert_many(reversed(accepted))
+    return len(accepted), rejected
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import students from a CSV file.")
+    parser.add_argument('file', help="CSV file with id, firstname, lastname, program_code, year, gender columns")
+    parser.add_argument('--errors', help="where to write rejected rows (default: <file>.errors.csv)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows per worker task")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU, 1 to stay in-process)")
+    args = parser.parse_args(argv)
+
+    errors_path = args.errors or os.path.splitext(args.file)[0] + '.errors.csv'
+    accepted, rejected = import_students(args.file, errors_path, args.chunk_size, args.workers)
+    print(f"Imported {accepted} students.")
+    if rejected:
+        print(f"Rejected {rejected} rows, see {errors_path}")
+    return 1 if rejected and not accepted else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
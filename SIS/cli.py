@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+
+# table name on the command line -> handler in data_handler
+TABLES = {'students': 'student_db', 'programs': 'program_db', 'colleges': 'college_db'}
+
+# where the app keeps its csv files unless told otherwise
+DEFAULT_DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def non_negative(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m SIS',
+                                     description="Query the student information system without the GUI.")
+    parser.add_argument('--data-dir', default=os.environ.get('SIS_DATA_DIR', DEFAULT_DATA_DIR),
+                        help="directory holding the csv files (default: $SIS_DATA_DIR or the app directory)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--format', choices=['csv', 'json', 'jsonl'], default='csv', help="output format (default: csv)")
+
+    def command(name, help, records=True):
+        sub = commands.add_parser(name, help=help, parents=[output] if records else [])
+        sub.add_argument('table', choices=sorted(TABLES))
+        return sub
+
+    listing = command('list', "print every record, newest first")
+    listing.add_argument('--offset', type=non_negative, default=0, help="skip this many records first")
+    listing.add_argument('--limit', type=non_negative, help="print at most this many records")
+    command('get', "print the record with this key").add_argument('key')
+    command('search', "print the records containing text in any field").add_argument('query')
+    command('filter', "print the records matching every FIELD=VALUE[,VALUE...]").add_argument('facets', nargs='+', metavar='FIELD=VALUE')
+    command('count', "print the number of records, optionally matching FIELD=VALUE[,VALUE...]",
+            records=False).add_argument('facets', nargs='*', metavar='FIELD=VALUE')
+    sort = command('sort', "print the records ordered by a field, optionally filtered first")
+    sort.add_argument('field')
+    sort.add_argument('facets', nargs='*', metavar='FIELD=VALUE')
+    sort.add_argument('--desc', action='store_true', help="largest first")
+    return parser
+
+def parse_facets(parser, pairs, fieldnames):
+    """Turn ['gender=Male', 'year=1,2'] into {'gender': ['Male'], 'year': ['1', '2']}."""
+    facets = {}
+    for pair in pairs:
+        field, sep, values = pair.partition('=')
+        if not sep or field not in fieldnames:
+            parser.error(f"bad filter {pair!r}: expected FIELD=VALUE[,VALUE...] with FIELD one of {', '.join(fieldnames)}")
+        facets.setdefault(field, []).extend(values.split(','))
+    return facets
+
+def run(parser, args):
+    # loading data_handler creates any csv file it doesn't find, so a mistyped
+    # --data-dir would quietly get a set of empty tables
+    missing = [f"{name}.csv" for name in sorted(TABLES) if not os.path.isfile(os.path.join(args.data_dir, f"{name}.csv"))]
+    if missing:
+        print(f"{args.data_dir} has no {', '.join(missing)}; use --data-dir or SIS_DATA_DIR to point at the csv files",
+              file=sys.stderr)
+        return 1
+
+    # the tables are opened relative to the working directory when data_handler loads
+    os.chdir(args.data_dir)
+    import data_handler as dh
+    table = getattr(dh, TABLES[args.table])
+
+    if args.command == 'count':
+        print(table.count(parse_facets(parser, args.facets, table.fieldnames)))
+        return 0
+
+    if args.command == 'list':
+        # a page is read straight from its place in the file, a full listing is streamed
+        if args.offset or args.limit is not None:
+            limit = args.limit if args.limit is not None else table.count()
+            records = table.load_page(args.offset, limit)
+        else:
+            records = table.iter_records()
+    elif args.command == 'get':
+        record = table.get(args.key)
+        if record is None:
+            print(f"No {args.table[:-1]} with {table.key} {args.key!r}", file=sys.stderr)
+            return 1
+        records = [record]
+    elif args.command == 'search':
+        records = table.search(args.query)
+    elif args.command == 'filter':
+        records = table.filter(parse_facets(parser, args.facets, table.fieldnames))
+    else:
+        if args.field not in table.fieldnames:
+            parser.error(f"unknown field {args.field!r}: expected one of {', '.join(table.fieldnames)}")
+        facets = parse_facets(parser, args.facets, table.fieldnames)
+        records = table.sorted_records(args.field, args.desc, subset=table.filter(facets) if facets else None)
+
+    import export
+    export.write_records(records, table.fieldnames, sys.stdout, args.format)
+    return 0
+
+def main(argv=None):
+    parser = build_parser()
+    # facets may follow the options (sort ... --desc year=1); parse_intermixed_args
+    # would allow that but refuses subcommands, so pick the leftovers up here
+    args, extra = parser.parse_known_args(argv)
+    if extra and hasattr(args, 'facets') and not any(arg.startswith('-') for arg in extra):
+        args.facets += extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    try:
+        return run(parser, args)
+    except BrokenPipeError:
+        # the reader went away (e.g. piped into head); not an error for us
+        sys.stdout = open(os.devnull, 'w')
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # columnar storage is optional, everything else works without it
+    np = None
+
+def available():
+    return np is not None
+
+def _parse_int(value):
+    # only accept values that format back to exactly the same text
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    return number if str(number) == value and -2**31 <= number < 2**31 else None
+
+def _parse_student_id(value):
+    if len(value) == 9 and value[4] == '-' and value[:4].isdigit() and value[5:].isdigit():
+        return int(value[:4]) * 10000 + int(value[5:])
+    return None
+
+def _format_student_id(number):
+    return f"{number // 10000:04d}-{number % 10000:04d}"
+
+_NUMERIC = {
+    'int': (_parse_int, str),
+    'student_id': (_parse_student_id, _format_student_id),
+}
+
+class ColumnarTable:
+    """A column-per-field copy of a table backed by NumPy arrays.
+
+    Fields whose kind is 'int' or 'student_id' are stored as int32 arrays
+    (student ids packed as YYYYNNNN). Every other field is stored as int32
+    codes into a pool of its distinct strings, so program codes, genders and
+    repeated names are only kept once. A numeric field holding anything that
+    wouldn't round-trip falls back to a pool, so records always come back
+    exactly as they went in.
+
+    Filtering, counting and sorting work on whole arrays at a time. Records
+    can still be read back as dicts by position, for code that expects the
+    list-of-dicts shape that DataHandler.load_data returns.
+    """
+    def __init__(self, fieldnames, numeric, pooled, size):
+        self.fieldnames = list(fieldnames)
+        self.numeric = numeric  # field -> (int32 array, (parser, formatter))
+        self.pooled = pooled    # field -> (int32 codes, list of strings)
+        self.size = size
+
+    @classmethod
+    def from_rows(cls, fieldnames, rows, kinds=None):
+        """Build a table from an iterable of value sequences in fieldnames order."""
+        if np is None:
+            raise RuntimeError("columnar storage needs numpy")
+        kinds = kinds or {}
+
+        pools = [{} for _ in fieldnames]
+        codes = [array('i') for _ in fieldnames]
+        for row in rows:
+            for pool, column, value in zip(pools, codes, row):
+                code = pool.get(value)
+                if code is None:
+                    code = pool[value] = len(pool)
+                column.append(code)
+
+        size = len(codes[0]) if codes else 0
+        numeric = {}
+        pooled = {}
+        for field, pool, column in zip(fieldnames, pools, codes):
+            column = np.frombuffer(column, dtype=np.int32) if len(column) else np.zeros(0, dtype=np.int32)
+            strings = list(pool)
+            kind = _NUMERIC.get(kinds.get(field))
+            if kind is not None:
+                parse, fmt = kind
+                parsed = [parse(v) for v in strings]
+                if None not in parsed:
+                    values = np.array(parsed, dtype=np.int32)[column] if strings else np.zeros(0, dtype=np.int32)
+                    numeric[field] = (values, kind)
+                    continue
+            pooled[field] = (column, strings)
+        return cls(fieldnames, numeric, pooled, size)
+
+    @classmethod
+    def from_records(cls, fieldnames, records, kinds=None):
+        return cls.from_rows(fieldnames, ([r[f] for f in fieldnames] for r in records), kinds)
+
+    def __len__(self):
+        return self.size
+
+    def nbytes(self):
+        """Rough memory used by the arrays and the string pools."""
+        total = sum(values.nbytes for values, _ in self.numeric.values())
+        for column, strings in self.pooled.values():
+            total += column.nbytes + sum(len(s) + 49 for s in strings)
+        return total
+
+    # READING RECORDS BACK
+
+    def column(self, field, indices=None):
+        """Return one field's values as a list of strings."""
+        if field in self.numeric:
+            values, (_, fmt) = self.numeric[field]
+            if indices is not None:
+                values = values[indices]
+            return [fmt(v) for v in values.tolist()]
+        column, strings = self.pooled[field]
+        if indices is not None:
+            column = column[indices]
+        return list(map(strings.__getitem__, column.tolist()))
+
+    def take(self, indices):
+        """Return the records at these positions as dicts."""
+        indices = np.asarray(indices, dtype=np.intp)
+        columns = [self.column(f, indices) for f in self.fieldnames]
+        return [dict(zip(self.fieldnames, values)) for values in zip(*columns)]
+
+    def __getitem__(self, i):
+        return self.take([i])[0]
+
+    def __iter__(self):
+        chunk = 4096
+        for start in range(0, self.size, chunk):
+            yield from self.take(np.arange(start, min(start + chunk, self.size)))
+
+    def to_records(self):
+        return self.take(np.arange(self.size))
+
+    # VECTORIZED QUERIES
+
+    def mask(self, field, values):
+        """Boolean array of the rows whose field equals any of values, ignoring case."""
+        if field in self.numeric:
+            column, (parse, _) = self.numeric[field]
+            wanted = [n for n in (parse(str(v)) for v in values) if n is not None]
+            return np.isin(column, np.array(wanted, dtype=np.int32))
+        column, strings = self.pooled[field]
+        wanted = {str(v).casefold() for v in values}
+        hits = np.fromiter((s.casefold() in wanted for s in strings), dtype=bool, count=len(strings))
+        return hits[column]
+
+    def _matching(self, facets):
+        keep = np.ones(self.size, dtype=bool)
+        for field, values in facets.items():
+            keep &= self.mask(field, values)
+        return keep
+
+    def filter(self, facets):
+        """Return the positions matching every facet (OR within, AND across)."""
+        return np.flatnonzero(self._matching(facets))
+
+    def count(self, facets=None):
+        if not facets:
+            return self.size
+        return int(np.count_nonzero(self._matching(facets)))
+
+    def argsort(self, field, key=None, reverse=False):
+        """Return positions in ascending (or reversed) order of field.
+
+        Pooled fields are ranked by key(string), case-insensitively by
+        default; ties keep their table order.
+        """
+        if field in self.numeric:
+            order = np.argsort(self.numeric[field][0], kind='stable')
+        else:
+            column, strings = self.pooled[field]
+            key = key or (lambda s: s.casefold())
+            ranked = sorted(range(len(strings)), key=lambda i: key(strings[i]))
+            rank = np.empty(len(strings), dtype=np.int32)
+            rank[ranked] = np.arange(len(strings), dtype=np.int32)
+            order = np.argsort(rank[column], kind='stable')
+        return order[::-1] if reverse else order
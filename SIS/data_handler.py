@@ -1,41 +1,1140 @@
 import csv
+import gc
+import io
 import os
-import re
+import threading
+from contextlib import contextmanager
+from itertools import islice
 
-class DataHandler:
+import metrics
+import row_index
+import snapshot
+from bitmap_index import BitmapIndex
+from file_lock import FileLock
+from search_index import TrigramIndex
+from storage import ChangeLog, Storage, merge_records
+from validation import validate_student_id
+
+# number of journaled changes after which the csv is rewritten in the background
+JOURNAL_COMPACT_THRESHOLD = 500
+
+# below this many rows the plain list beats columnar storage, numpy import included
+COLUMNAR_MIN_ROWS = 20000
+
+# times a read-modify-write is redone after losing a race with another process
+WRITE_RETRIES = 5
+
+# optional settings file read from the working directory, see open_table
+CONFIG_FILE = 'sis.ini'
+
+class ConflictError(Exception):
+    """The file was changed by another process since the data being written was read."""
+
+class DataHandler(Storage):
     """Handles CSV file operations for database entities.
     
     Provides methods to load and save data to CSV files with automatic
-    file creation and header management.
+    file creation and header management. Parsed records are kept in memory
+    and only re-read when the file's mtime or size changes on disk.
+    iter_records() and load_page() read without loading it all; pages come
+    straight from their place in the CSV, found through a row offset index
+    (see row_index.RowIndex) that is rebuilt on demand whenever the CSV
+    changes.
+
+    A binary snapshot (see snapshot.Snapshot) is kept next to the CSV and
+    read instead of parsing the text whenever it matches the CSV's current
+    mtime and size; it is rewritten after the app rewrites the CSV and
+    whenever the CSV is found to have changed outside the app.
+
+    Single-row inserts, updates and deletes are appended to a journal file
+    next to the CSV and merged in when the file is loaded. Once the journal
+    grows past compact_threshold entries it is folded back into the CSV on
+    a background thread.
+
+    Several processes may share the files. Every write holds an advisory
+    lock on <file>.lock and first checks the files still match the version
+    this handler last read; single-row writes reload and re-apply against
+    the fresh data, save_data raises ConflictError and modify() retries.
+    Files are only ever replaced by rename, so readers never take the lock.
+
+    Once loaded, the records are brought up to date in place: if only the
+    journal grew, just the new lines are replayed, otherwise the files are
+    re-read and merged by key. Either way untouched records keep their
+    identity, and refresh() reports what other processes changed.
+
+    The first field is the primary key. Records are indexed by it, and by
+    value for every field listed in foreign_keys, so lookups and orphan
+    checks don't have to scan the table. A trigram index for search() is
+    built on first use and kept up to date by the writes.
+
+    sort_keys maps a field to the function that turns its text into a sort
+    key (fields not listed sort case-insensitively). sorted_records() keeps
+    one sorted permutation per field until the next write.
+
+    column_kinds opts the table into columnar storage when NumPy is
+    installed (see columnar.ColumnarTable); filtering, counting and sorting
+    then run as array operations once the table has COLUMNAR_MIN_ROWS rows.
+    The columns are rebuilt in the background after a write, and until
+    they catch up those queries take the row-wise path.
     """
-    def __init__(self, filename, fieldnames):
+    def __init__(self, filename, fieldnames, foreign_keys=(), sort_keys=None, column_kinds=None,
+                 compact_threshold=JOURNAL_COMPACT_THRESHOLD):
         self.filename = filename
         self.fieldnames = fieldnames
+        self.key = fieldnames[0]
+        self.foreign_keys = tuple(foreign_keys)
+        self.sort_keys = dict(sort_keys or {})
+        self.column_kinds = column_kinds
+        self.journal_filename = filename + '.journal'
+        self.compacting_filename = filename + '.compacting'
+        self.snapshot_filename = filename + '.snap'
+        self.index_filename = filename + '.idx'
+        self._file_lock = FileLock(filename + '.lock')
+        self.compact_threshold = compact_threshold
+
+        # in-memory copy of the file and the stat stamp it was read at
+        self._records = None
+        self._stamp = None
+        self._by_key = {}
+        self._refs = {field: {} for field in self.foreign_keys}
+        self._search_index = None
+        self._sort_cache = {}
+        self._bitmaps = None
+        self._columns = None
+        self._column_builder = None
+        # bumped on every change so work done outside the lock can tell it went stale
+        self._version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # file traffic, for the metrics layer
+        self.metrics_name = os.path.splitext(os.path.basename(filename))[0]
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+        self._lock = threading.RLock()
+        self._journal_len = 0
+        self._generation = 0
+        self._compactor = None
+        # row count kept up to date by the writes and reloads, so count() never has to read anything
+        self._total = None
+        # keys changed by other processes since the last refresh(); None until someone asks
+        self._unseen = None
 
         if not os.path.exists(self.filename):
             with open(self.filename, mode = 'w', newline = '') as f:
                 writer = csv.DictWriter(f, fieldnames=self.fieldnames)
                 writer.writeheader()
 
+    def _file_stamp(self):
+        stamp = []
+        for path in (self.filename, self.compacting_filename, self.journal_filename):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _journal_entries(self, row):
+        """Return the (op, values) changes on one journal line, or None if it is torn or foreign.
+
+        A line holds one change (I or U with every field, D with the key) or,
+        on a T line, several changes committed together, so a crash halfway
+        through writing them loses all of them rather than some.
+        """
+        sizes = {'I': len(self.fieldnames), 'U': len(self.fieldnames), 'D': 1}
+        batch = bool(row) and row[0] == 'T'
+        i = 1 if batch else 0
+        entries = []
+        while i < len(row):
+            n = sizes.get(row[i])
+            if n is None or i + 1 + n > len(row):
+                return None
+            entries.append((row[i], row[i + 1:i + 1 + n]))
+            i += 1 + n
+            if not batch:
+                break
+        if not entries or i != len(row):
+            return None
+        return entries
+
+    def _journal_overlay(self):
+        """Replay the journals without the CSV, returning (inserted, changed, entry count, removed).
+
+        inserted maps the keys the journals inserted to their records, oldest
+        first; changed maps keys of CSV rows to their updated record, or to
+        None when the row was deleted or inserted again on top. removed is
+        true if a delete may have taken a row out of the CSV, so the
+        positions of the rows after it no longer match the file.
+        """
+        inserted = {}
+        changed = {}
+        count = 0
+        removed = False
+        for path in (self.compacting_filename, self.journal_filename):
+            if not os.path.exists(path):
+                continue
+            self.bytes_read += os.path.getsize(path)
+            with open(path, mode = 'r', newline='') as f:
+                for row in csv.reader(f):
+                    entries = self._journal_entries(row)
+                    if entries is None:
+                        # torn or foreign line, e.g. a write cut short by a crash
+                        continue
+                    for op, values in entries:
+                        if op == 'D':
+                            if inserted.pop(values[0], None) is None:
+                                removed = True
+                            changed[values[0]] = None
+                            continue
+                        record = dict(zip(self.fieldnames, values))
+                        k = record[self.key]
+                        if op == 'I':
+                            inserted.pop(k, None)
+                            inserted[k] = record
+                            changed[k] = None
+                        elif k in inserted:
+                            inserted[k] = record
+                        elif changed.get(k, record) is not None:
+                            changed[k] = record
+                    count += len(entries)
+        return inserted, changed, count, removed
+
+    @staticmethod
+    def _merged(inserted, changed, records, key):
+        # newest inserts go on top, same as the app has always done
+        yield from reversed(inserted.values())
+        for record in records:
+            k = record[key]
+            if k in changed:
+                record = changed[k]
+                if record is None:
+                    continue
+            yield record
+
+    def _journal_exists(self):
+        return os.path.exists(self.journal_filename) or os.path.exists(self.compacting_filename)
+
+    def _read_base(self):
+        records = snapshot.read_snapshot(self.snapshot_filename, self.filename, self.fieldnames)
+        if records is not None:
+            self.bytes_read += os.path.getsize(self.snapshot_filename)
+        else:
+            # stamp before reading, so a file changing mid-read leaves a stale snapshot
+            stamp = snapshot.csv_stamp(self.filename)
+            self.bytes_read += stamp[1]
+            with open(self.filename, mode = 'r', newline='') as f:
+                records = list(csv.DictReader(f))
+            self._write_snapshot(stamp, records)
+        return records
+
+    def _write_snapshot(self, stamp, records):
+        try:
+            if snapshot.write_snapshot(self.snapshot_filename, stamp, self.fieldnames, records):
+                self.bytes_written += os.path.getsize(self.snapshot_filename)
+            elif os.path.exists(self.snapshot_filename):
+                # values the format can't hold; fall back to parsing the csv every time
+                os.remove(self.snapshot_filename)
+        except OSError:
+            pass
+
+    def _read_all(self):
+        records = self._read_base()
+
+        if not self._journal_exists():
+            self._journal_len = 0
+            return records
+
+        inserted, changed, self._journal_len, _ = self._journal_overlay()
+        return list(self._merged(inserted, changed, records, self.key))
+
+    def _read_stable(self, stamp):
+        # a compaction may swap files under us mid-read, so read until stable
+        while True:
+            records = self._read_all()
+            after = self._file_stamp()
+            if after == stamp:
+                return records, stamp
+            stamp = after
+
+    def _ensure_loaded(self):
+        stamp = self._file_stamp()
+        if self._records is not None and stamp == self._stamp:
+            self.cache_hits += 1
+            return
+        self.cache_misses += 1
+        if self._records is not None and self._replay_journal_tail(stamp):
+            return
+        with _gc_paused():
+            records, stamp = self._read_stable(stamp)
+            if self._records is not None:
+                records, changes = merge_records(self.key, self._records, records)
+                if self._unseen is not None:
+                    self._unseen.note_changes(self.key, changes)
+            self._set_records(records)
+        self._stamp = stamp
+
+    def _replay_journal_tail(self, stamp):
+        """Apply only the journal lines appended since the last read.
+
+        Works when the CSV and the journal being compacted are unchanged and
+        the journal has only grown; returns False if a full read is needed.
+        """
+        old = self._stamp
+        if old is None or old[:2] != stamp[:2] or stamp[2] is None:
+            return False
+        offset = old[2][1] if old[2] else 0
+        if stamp[2][1] <= offset:
+            return False
+        with open(self.journal_filename, mode = 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        after = self._file_stamp()
+        if not data.endswith(b'\n') or after[:2] != stamp[:2] or after[2][1] != offset + len(data):
+            # caught a write halfway, or the files moved on meanwhile
+            return False
+        self.bytes_read += len(data)
+
+        for row in csv.reader(io.TextIOWrapper(io.BytesIO(data), newline='')):
+            entries = self._journal_entries(row)
+            if entries is None:
+                continue
+            for op, values in entries:
+                if op == 'D':
+                    if self._apply_delete(values[0]):
+                        self._note_change('removed', values[0])
+                    continue
+                record = dict(zip(self.fieldnames, values))
+                key = record[self.key]
+                if op == 'U' and self._apply_update(record):
+                    self._note_change('updated', key)
+                else:
+                    if self._apply_insert(record) is not None:
+                        self._note_change('removed', key)
+                    self._note_change('added', key)
+            self._journal_len += len(entries)
+        self._stamp = after
+        return True
+
+    def _note_change(self, kind, key):
+        if self._unseen is not None:
+            self._unseen.note(kind, key)
+
+    def changed(self):
+        # no lock: this is polled from the gui thread while a worker may be loading
+        if self._unseen is None:
+            self._unseen = ChangeLog()
+        elif self._unseen:
+            # picked up by a read since, but not handed out yet
+            return True
+        return self._records is not None and self._file_stamp() != self._stamp
+
+    def refresh(self):
+        with self._lock:
+            if self._unseen is None:
+                self._unseen = ChangeLog()
+            if self._records is None:
+                return None
+            self._ensure_loaded()
+            if not self._unseen:
+                return None
+            changes = self._unseen.changes(self.key, self._records)
+            self._unseen = ChangeLog()
+            return changes
+
+    def _set_records(self, records):
+        self._records = records
+        self._total = len(records)
+        if self._search_index is not None:
+            # patched rather than dropped, a rebuild takes seconds on a big table
+            self._search_index.sync(records)
+        self._sort_cache = {}
+        self._version += 1
+        self._by_key = {r[self.key]: r for r in records}
+        for field in self.foreign_keys:
+            refs = {}
+            for r in records:
+                refs.setdefault(r[field], {})[r[self.key]] = r
+            self._refs[field] = refs
+
+    def _index_add(self, record):
+        self._by_key[record[self.key]] = record
+        for field in self.foreign_keys:
+            self._refs[field].setdefault(record[field], {})[record[self.key]] = record
+
+    def _index_remove(self, record):
+        self._by_key.pop(record[self.key], None)
+        for field in self.foreign_keys:
+            refs = self._refs[field].get(record[field])
+            if refs is not None:
+                refs.pop(record[self.key], None)
+                if not refs:
+                    del self._refs[field][record[field]]
+
+    @metrics.instrument
     def load_data(self):
-        with open(self.filename, mode = 'r', newline='') as f:
-            return list(csv.DictReader(f))
+        """Return all records as a new list.
+
+        The list is a copy, but the record dicts are shared with the cache,
+        so a caller that edits a record must pass the list to save_data.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._records)
         
+    def head(self, n):
+        """Return the first n records.
+
+        Before the table has been loaded they come straight from the start of
+        the snapshot or the CSV, with any journal laid over them, so a
+        screenful can be shown without waiting for the whole file.
+        """
+        with self._lock:
+            if self._records is None:
+                if self._journal_exists():
+                    records = self.iter_records()
+                    try:
+                        return list(islice(records, n))
+                    finally:
+                        records.close()
+                records = snapshot.read_snapshot(self.snapshot_filename, self.filename, self.fieldnames, stop=n)
+                if records is None:
+                    with open(self.filename, mode = 'r', newline='') as f:
+                        records = list(islice(csv.DictReader(f), n))
+                return records
+            self._ensure_loaded()
+            return self._records[:n]
+
+    @contextmanager
+    def _writing(self):
+        """Hold both locks with the cache brought up to date with the files."""
+        with self._lock, self._file_lock:
+            self._ensure_loaded()
+            yield
+
+    def iter_records(self):
+        """Yield every record in table order without holding the whole table in memory.
+
+        Loaded records are yielded from a copy of the list; otherwise the CSV
+        is streamed with the journal merged in on the fly.
+        """
+        with self._lock:
+            stamp = self._file_stamp()
+            records = list(self._records) if self._records is not None and stamp == self._stamp else None
+        if records is not None:
+            yield from records
+            return
+        while True:
+            # a compaction swapping files between reading the journal and opening
+            # the csv would apply the journal twice, so check they belong together
+            f = open(self.filename, mode = 'r', newline='')
+            inserted, changed, count, _ = self._journal_overlay()
+            after = self._file_stamp()
+            if after == stamp:
+                break
+            f.close()
+            stamp = after
+        with f:
+            self.bytes_read += stamp[0][1]
+            yield from self._merged(inserted, changed, csv.DictReader(f), self.key)
+
+    def load_page(self, offset, limit):
+        """Return up to limit records starting at position offset, in table order.
+
+        With nothing loaded, only the rows asked for are read, from where
+        the row index says they start in the CSV, so the last page of a big
+        file is as quick as the first. Inserts and updates in the journal are
+        laid over them; once it holds a delete, or the table is loaded, the
+        page is a slice of the loaded records.
+        """
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must be non-negative")
+        with self._lock:
+            if self._records is None:
+                page = self._read_overlaid_page(offset, limit)
+                if page is not None:
+                    return page
+            self._ensure_loaded()
+            return self._records[offset:offset + limit]
+
+    def _read_overlaid_page(self, offset, limit):
+        """Return a page of the CSV with the journal applied, or None if that needs a full load."""
+        stamp = self._file_stamp()
+        if stamp[1] is None and stamp[2] is None:
+            return self._read_page(offset, limit)
+        inserted, changed, _, removed = self._journal_overlay()
+        if removed:
+            return None
+        # the table starts with the inserts, newest first, then the csv rows
+        top = list(reversed(inserted.values()))
+        page = top[offset:offset + limit]
+        if len(page) < limit:
+            rows = self._read_page(max(offset - len(top), 0), limit - len(page))
+            if rows is None:
+                return None
+            page += [changed.get(r[self.key], r) for r in rows]
+        if any(r is None for r in page) or self._file_stamp() != stamp:
+            # a row inserted over an old one, or the files moved on meanwhile
+            return None
+        return page
+
+    def _open_row_index(self):
+        """Return the RowIndex for the CSV as it is now, rebuilding it if needed; None if that fails."""
+        stamp = snapshot.csv_stamp(self.filename)
+        try:
+            index = row_index.RowIndex(self.index_filename)
+            if index.stamp == stamp:
+                return index
+            index.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            offsets = row_index.scan_rows(self.filename)
+            if snapshot.csv_stamp(self.filename) != stamp:
+                # rewritten while we scanned it
+                return None
+            self.bytes_read += stamp[1]
+            row_index.write_index(self.index_filename, stamp, offsets)
+            self.bytes_written += os.path.getsize(self.index_filename)
+            return row_index.RowIndex(self.index_filename)
+        except (OSError, ValueError):
+            return None
+
+    def _read_page(self, offset, limit):
+        index = self._open_row_index()
+        if index is None:
+            return None
+        with index:
+            stop = min(offset + limit, index.count)
+            if offset >= stop:
+                return []
+            start, end = index.offset(offset), index.offset(stop)
+        with open(self.filename, mode = 'rb') as f:
+            header = f.readline()
+            f.seek(start)
+            data = f.read(end - start)
+        if snapshot.csv_stamp(self.filename) != index.stamp:
+            # the file was replaced under us
+            return None
+        self.bytes_read += len(header) + len(data)
+        text = io.TextIOWrapper(io.BytesIO(header + data), newline='')
+        return list(csv.DictReader(text))
+
+    @metrics.instrument
     def save_data(self, data_list):
-        with open(self.filename, mode = 'w', newline='') as f:
+        """Replace the whole table with data_list.
+
+        Raises ConflictError if another process wrote to the table after this
+        handler last read it, as data_list was then built from stale records.
+        """
+        with self._lock, self._file_lock:
+            if self._stamp is not None and self._file_stamp() != self._stamp:
+                raise ConflictError(f"{self.filename} was changed by another process")
+            self._write_csv(self.filename, data_list)
+            self._write_snapshot(snapshot.csv_stamp(self.filename), data_list)
+            for path in (self.journal_filename, self.compacting_filename):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            # what we just wrote is already the freshest copy
+            self._generation += 1
+            self._journal_len = 0
+            self._set_records(list(data_list))
+            self._stamp = self._file_stamp()
+
+    def _write_csv(self, path, data_list):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, mode = 'w', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=self.fieldnames)
             writer.writeheader()
             writer.writerows(data_list)
+        self.bytes_written += os.path.getsize(tmp)
+        os.replace(tmp, path)
+
+    def modify(self, change, retries=WRITE_RETRIES):
+        """Save change(records) over the table, redone if another process got there first.
+
+        change gets a fresh list of the current records and returns the new
+        list; it must not have side effects, since after a conflict it is
+        called again with the other process's changes loaded. Returns the
+        saved list.
+        """
+        for attempt in range(retries):
+            with self._lock:
+                self._ensure_loaded()
+                data_list = change(list(self._records))
+                try:
+                    self.save_data(data_list)
+                    return data_list
+                except ConflictError:
+                    continue
+        raise ConflictError(f"{self.filename} kept changing, gave up after {retries} tries")
+
+    # SINGLE-ROW WRITES
+
+    def _journal_torn(self):
+        with open(self.journal_filename, mode = 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def _append_journal(self, entries):
+        """Write (op, values) changes with one append, as a T line if there are several."""
+        if len(entries) == 1:
+            op, values = entries[0]
+            row = [op] + list(values)
+        else:
+            row = ['T']
+            for op, values in entries:
+                row.append(op)
+                row.extend(values)
+        with open(self.journal_filename, mode = 'a', newline='') as f:
+            start = f.tell()
+            if start and self._journal_torn():
+                # start on a fresh line, not on the end of one a crash cut short
+                f.write('\r\n')
+            csv.writer(f).writerow(row)
+            self.bytes_written += f.tell() - start
+        self._journal_len += len(entries)
+        self._stamp = self._file_stamp()
+        if self._journal_len >= self.compact_threshold:
+            self.compact(background=True)
+
+    def _apply_insert(self, record):
+        """Put record on top in memory, returning the record it replaced, if any."""
+        self._version += 1
+        old = self._by_key.get(record[self.key])
+        if old is not None:
+            self._records.remove(old)
+            self._index_remove(old)
+        else:
+            self._total += 1
+        self._records.insert(0, record)
+        self._index_add(record)
+        if self._search_index is not None:
+            self._search_index.add(record)
+        return old
+
+    def _apply_update(self, record):
+        current = self._by_key.get(record[self.key])
+        if current is None:
+            return False
+        self._version += 1
+        self._index_remove(current)
+        current.update({f: record.get(f, '') for f in self.fieldnames})
+        self._index_add(current)
+        if self._search_index is not None:
+            self._search_index.update(current)
+        return current
+
+    def _apply_delete(self, key):
+        current = self._by_key.get(key)
+        if current is None:
+            return False
+        self._version += 1
+        self._total -= 1
+        self._records.remove(current)
+        self._index_remove(current)
+        if self._search_index is not None:
+            self._search_index.remove(key)
+        return True
+
+    def insert(self, record):
+        """Add a record at the top of the table."""
+        with self._writing():
+            record = {f: record.get(f, '') for f in self.fieldnames}
+            entries = [('I', record.values())]
+            if self._apply_insert(record) is not None:
+                # journaled as a delete first, so readers know a row left the csv
+                entries.insert(0, ('D', [record[self.key]]))
+            self._append_journal(entries)
+
+    def insert_many(self, records):
+        """Insert records as if insert() were called for each in turn.
+
+        Instead of journaling every row, the table is rewritten once with the
+        new records on top (see save_data), which is far cheaper for bulk
+        imports. Returns the number of records inserted.
+        """
+        added = {}
+        count = 0
+        for record in records:
+            record = {f: record.get(f, '') for f in self.fieldnames}
+            # a later copy of the same key wins, and moves to the top
+            added.pop(record[self.key], None)
+            added[record[self.key]] = record
+            count += 1
+        if added:
+            top = list(reversed(added.values()))
+            self.modify(lambda current: top + [r for r in current if r[self.key] not in added])
+        return count
 
-def validate_student_id(student_id):
-    pattern = r"^\d{4}-\d{4}$"
-    return bool(re.match(pattern, student_id))
+    def update(self, record):
+        """Replace the fields of the record sharing record's key.
+
+        Returns False if there is no such record.
+        """
+        with self._writing():
+            current = self._apply_update(record)
+            if not current:
+                return False
+            self._append_journal([('U', current.values())])
+            return True
+
+    def update_many(self, records):
+        """Update several records as one change.
+
+        The changes go into the journal as a single line, written with one
+        append, and are replayed all together or (after a crash) not at all.
+        Returns the number of records found and updated.
+        """
+        with self._writing():
+            entries = []
+            for record in records:
+                current = self._apply_update(record)
+                if current:
+                    entries.append(('U', list(current.values())))
+            if entries:
+                self._append_journal(entries)
+            return len(entries)
+
+    def delete(self, key):
+        with self._writing():
+            if not self._apply_delete(key):
+                return False
+            self._append_journal([('D', [key])])
+            return True
+
+    def delete_many(self, keys):
+        """Delete several records as one change (see update_many); returns how many existed."""
+        with self._writing():
+            entries = [('D', [key]) for key in keys if self._apply_delete(key)]
+            if entries:
+                self._append_journal(entries)
+            return len(entries)
+
+    def replace_value(self, field, old, new):
+        """Set field to new on every record where it is old; returns how many changed.
+
+        The records are found through the key or foreign key index, changed
+        in place, and the file is rewritten once, in a single pass, then
+        swapped in by rename.
+        """
+        with self._writing():
+            if field == self.key:
+                if new in self._by_key:
+                    raise ValueError(f"{new} already exists")
+                affected = [self._by_key[old]] if old in self._by_key else []
+            elif field in self._refs:
+                affected = list(self._refs[field].get(old, {}).values())
+            else:
+                affected = [r for r in self._records if r[field] == old]
+            if not affected:
+                return 0
+            for record in affected:
+                record[field] = new
+            self.save_data(self._records)
+            return len(affected)
+
+    # INDEXED LOOKUPS
+
+    def get(self, key):
+        """Return the record with this primary key, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_key.get(key)
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def referencing(self, field, value):
+        """Return the records whose foreign key field equals value."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._refs[field].get(value, {}).values())
+
+    def has_references(self, field, value):
+        with self._lock:
+            self._ensure_loaded()
+            return bool(self._refs[field].get(value))
+
+    def build_search_index(self):
+        """Make sure the search index exists, building it without holding the lock.
+
+        Building takes a while on big tables, so writes and lookups from the
+        GUI thread can carry on meanwhile; a build that raced a write is
+        thrown away and redone.
+        """
+        while True:
+            with self._lock:
+                self._ensure_loaded()
+                if self._search_index is not None:
+                    return
+                records = list(self._records)
+                version = self._version
+            index = TrigramIndex(self.key, self.fieldnames, records)
+            with self._lock:
+                if version == self._version:
+                    self._search_index = index
+                    return
+
+    def search(self, query):
+        """Return the records with query as a substring of any field, ignoring case."""
+        if query:
+            self.build_search_index()
+        with self._lock:
+            self._ensure_loaded()
+            if not query:
+                return list(self._records)
+            if self._search_index is None:
+                self._search_index = TrigramIndex(self.key, self.fieldnames, self._records)
+            return self._search_index.search(query)
+
+    # COLUMNAR STORAGE
+
+    def _columnar(self, wait=False):
+        """Return (records, ColumnarTable) for the current version, or None.
+
+        Rebuilding the columns costs several times a bitmap filter, so unless
+        wait is set a stale copy is rebuilt in the background and None is
+        returned meanwhile; the callers fall back to their row-wise path.
+        """
+        if self.column_kinds is None or self.count() < COLUMNAR_MIN_ROWS:
+            return None
+        import columnar
+        if not columnar.available():
+            return None
+
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version
+            if self._columns is not None and self._columns[0] == version:
+                return self._columns[1:]
+            records = list(self._records)
+            if not wait:
+                if not (self._column_builder and self._column_builder.is_alive()):
+                    self._column_builder = threading.Thread(
+                        target=self._build_columns, args=(version, records), daemon=True)
+                    self._column_builder.start()
+                return None
+        return self._build_columns(version, records)
+
+    def _build_columns(self, version, records):
+        import columnar
+        table = columnar.ColumnarTable.from_records(self.fieldnames, records, self.column_kinds)
+        with self._lock:
+            if version == self._version:
+                self._columns = (version, records, table)
+        return records, table
+
+    def columns(self):
+        """Return a ColumnarTable of the in-memory records, or None (no NumPy, or a small table)."""
+        cached = self._columnar(wait=True)
+        return cached[1] if cached else None
+
+    def load_columns(self):
+        """Read the file straight into a ColumnarTable without keeping any dicts.
+
+        Meant for scripts working on very large tables; needs NumPy.
+        """
+        import columnar
+        with self._lock:
+            if self._records is not None or self._journal_exists():
+                self._ensure_loaded()
+                return columnar.ColumnarTable.from_records(self.fieldnames, self._records, self.column_kinds)
+            with open(self.filename, mode = 'r', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                return columnar.ColumnarTable.from_rows(self.fieldnames, reader, self.column_kinds)
+
+    # FILTERING
+
+    def filter(self, facets):
+        """Return the records matching all facets, in table order.
+
+        facets maps a field to the values accepted for it (OR within a
+        facet, AND across facets, compared case-insensitively). The bitsets
+        behind this are built per table version, so repeated filtering
+        between writes only combines bits.
+        """
+        cached = self._columnar()
+        if cached:
+            records, table = cached
+            return list(map(records.__getitem__, table.filter(facets).tolist()))
+
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version
+            if self._bitmaps is not None and self._bitmaps[0] == version:
+                index = self._bitmaps[1]
+            else:
+                index = BitmapIndex(list(self._records))
+                self._bitmaps = (version, index)
+        # the index holds its own snapshot of the list, so it can be read unlocked
+        return index.select(facets)
+
+    # SORTING
+
+    def count(self, facets=None):
+        """Return the number of records, or of those matching facets (see filter).
+
+        The total is counted once and then kept up to date by this handler's
+        writes and reloads; it doesn't look at the files again, so it is
+        cheap enough for the gui thread. Writes by other processes show up
+        once refresh() or a load has picked them up.
+        """
+        if facets:
+            cached = self._columnar()
+            if cached:
+                return cached[1].count(facets)
+            return len(self.filter(facets))
+        with self._lock:
+            if self._total is None:
+                self._total = self._count_files()
+            return self._total
+
+    def _count_files(self):
+        if self._records is None:
+            stamp = self._file_stamp()
+            total = self._base_count()
+            if total is not None and stamp[1] is None and stamp[2] is None:
+                return total
+            if total is not None:
+                # without deletes the journal only adds its inserts to the csv rows
+                inserted, _, _, removed = self._journal_overlay()
+                if not removed and self._file_stamp() == stamp:
+                    return total + len(inserted)
+        self._ensure_loaded()
+        return len(self._records)
+
+    def _base_count(self):
+        """Return the number of rows in the CSV without loading it, or None."""
+        # the snapshot header has the row count
+        total = snapshot.snapshot_count(self.snapshot_filename, self.filename, self.fieldnames)
+        if total is not None:
+            return total
+        # or the row index, which is far quicker to rebuild than loading the table
+        index = self._open_row_index()
+        if index is None:
+            return None
+        with index:
+            return index.count
+
+    def sort_key(self, field):
+        keyfn = self.sort_keys.get(field, text_sort_key)
+        return lambda record: keyfn(record[field])
+
+    def sorted_records(self, field, reverse=False, subset=None):
+        """Return the records ordered by field.
+
+        The ascending order of the whole table is computed once per field and
+        reused until the next write, so flipping direction is a reversed copy.
+        If subset is given (e.g. the current search results) only those
+        records are returned, in the same order.
+        """
+        if subset is not None and len(subset) * 8 < self.count():
+            # a small subset is cheaper to sort on its own
+            return sorted(subset, key=self.sort_key(field), reverse=reverse)
+
+        with self._lock:
+            self._ensure_loaded()
+            version = self._version
+            cached = self._sort_cache.get(field)
+            if cached is not None and cached[0] == version:
+                order = cached[1]
+            else:
+                order = None
+                records = list(self._records)
+
+        if order is None:
+            # sort outside the lock, the gui thread may want the handler meanwhile
+            columns = self._columnar()
+            if columns:
+                records, table = columns
+                positions = table.argsort(field, key=self.sort_keys.get(field, text_sort_key))
+                order = list(map(records.__getitem__, positions.tolist()))
+            else:
+                order = sorted(records, key=self.sort_key(field))
+            with self._lock:
+                if version == self._version:
+                    self._sort_cache[field] = (version, order)
+
+        if subset is not None and len(subset) != len(order):
+            wanted = {r[self.key] for r in subset}
+            key = self.key
+            order = [r for r in order if r[key] in wanted]
+        return order[::-1] if reverse else list(order)
+
+    # COMPACTION
+
+    def compact(self, background=False):
+        """Fold the journal back into a clean CSV file."""
+        with self._lock, self._file_lock:
+            if self._compactor and self._compactor.is_alive():
+                return
+            self._ensure_loaded()
+            if not self._journal_len:
+                return
+
+            # new writes keep going to a fresh journal while the old one is folded in
+            if os.path.exists(self.journal_filename):
+                if os.path.exists(self.compacting_filename):
+                    with open(self.journal_filename, mode = 'r', newline='') as src, \
+                         open(self.compacting_filename, mode = 'a', newline='') as dst:
+                        dst.write(src.read())
+                    os.remove(self.journal_filename)
+                else:
+                    os.replace(self.journal_filename, self.compacting_filename)
+            records = list(self._records)
+            generation = self._generation
+            self._journal_len = 0
+            self._stamp = self._file_stamp()
+            # the csv and folded journal as they must still be when the result goes in
+            base = self._stamp[:2]
+
+        if background:
+            self._compactor = threading.Thread(target=self._finish_compaction,
+                                               args=(records, generation, base), daemon=True)
+            self._compactor.start()
+        else:
+            self._finish_compaction(records, generation, base)
+
+    def _finish_compaction(self, records, generation, base):
+        tmp = f"{self.filename}.{os.getpid()}.compact"
+        with open(tmp, mode = 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(records)
+
+        with self._lock, self._file_lock:
+            if generation != self._generation or self._file_stamp()[:2] != base:
+                # save_data, here or in another process, replaced the file while
+                # we were writing, or another process is folding the journal too
+                os.remove(tmp)
+                return
+            self.bytes_written += os.path.getsize(tmp)
+            os.replace(tmp, self.filename)
+            if os.path.exists(self.compacting_filename):
+                os.remove(self.compacting_filename)
+            self._stamp = self._file_stamp()
+            stamp = snapshot.csv_stamp(self.filename)
+        self._write_snapshot(stamp, records)
+
+    def invalidate(self):
+        with self._lock:
+            self._records = None
+            self._total = None
+            self._stamp = None
+            self._by_key = {}
+            self._refs = {field: {} for field in self.foreign_keys}
+            self._search_index = None
+
+    def cache_stats(self):
+        return {'hits': self.cache_hits, 'misses': self.cache_misses,
+                'journal': self._journal_len}
+
+@contextmanager
+def _gc_paused():
+    # building millions of small objects otherwise triggers collection after collection
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def text_sort_key(value):
+    return str(value).casefold()
+
+def int_sort_key(value):
+    # numbers first in numeric order, anything unparseable after them
+    try:
+        return (0, int(value), '')
+    except ValueError:
+        return (1, 0, str(value))
+
+def student_id_sort_key(value):
+    """Pack YYYY-NNNN into a single int so ids compare numerically."""
+    if len(value) == 9 and value[4] == '-' and value[:4].isdigit() and value[5:].isdigit():
+        return (0, int(value[:4]) * 10000 + int(value[5:]), '')
+    return (1, 0, str(value))
     
 
+def storage_config():
+    """Return (backend, database) from the [storage] section of sis.ini.
+
+    The SIS_BACKEND and SIS_DATABASE environment variables override it.
+    """
+    section = {}
+    if os.path.exists(CONFIG_FILE):
+        # only pay for configparser when there is something to parse
+        import configparser
+        parser = configparser.ConfigParser()
+        parser.read(CONFIG_FILE)
+        if parser.has_section('storage'):
+            section = parser['storage']
+    backend = os.environ.get('SIS_BACKEND') or section.get('backend', 'csv')
+    database = os.environ.get('SIS_DATABASE') or section.get('database', 'sis.db')
+    return backend.strip().lower(), database
+
+def open_table(filename, fieldnames, sort_sql=None, **options):
+    """Open a table with the configured storage backend ('csv' or 'sqlite')."""
+    backend, database = storage_config()
+    if backend == 'csv':
+        return DataHandler(filename, fieldnames, **options)
+    if backend == 'sqlite':
+        from sqlite_backend import SQLiteHandler
+        options.pop('column_kinds', None)
+        options.pop('compact_threshold', None)
+        return SQLiteHandler(database, filename, fieldnames, sort_sql=sort_sql, **options)
+    raise ValueError(f"Unknown storage backend {backend!r} in {CONFIG_FILE}")
+    
+
+def rename_key(table, old, new, children=(), cascade=True):
+    """Change the primary key old to new, and every reference to it in children.
+
+    children lists (table, field) pairs that refer to table's key. Each file
+    is rewritten at most once, with the referring tables first, so if this is
+    interrupted, running it again finishes the job. Without cascade it
+    refuses to orphan any references. Returns the number of references moved.
+    """
+    if old == new:
+        return 0
+    if not table.exists(old):
+        raise ValueError(f"{old} does not exist")
+    if table.exists(new):
+        raise ValueError(f"{new} already exists")
+    if not cascade:
+        for child, field in children:
+            if child.has_references(field, old):
+                raise ValueError(f"{old} is still referenced by {field}")
+    moved = 0
+    for child, field in children:
+        moved += child.replace_value(field, old, new)
+    table.replace_value(table.key, old, new)
+    return moved
+
 COLLEGE_FIELDS = ['code', 'name']
 PROGRAM_FIELDS = ['code', 'name', 'college_code']
 STUDENT_FIELDS = ['id', 'firstname', 'lastname', 'program_code', 'year', 'gender']
 
-college_db = DataHandler('colleges.csv', COLLEGE_FIELDS)
-program_db = DataHandler('programs.csv', PROGRAM_FIELDS)
-student_db = DataHandler('students.csv', STUDENT_FIELDS)
\ No newline at end of file
+# how each table is opened, shared with scripts that open their own copies
+COLLEGE_OPTIONS = {}
+PROGRAM_OPTIONS = {'foreign_keys': ['college_code']}
+STUDENT_OPTIONS = {'foreign_keys': ['program_code'],
+                   'sort_keys': {'id': student_id_sort_key, 'year': int_sort_key},
+                   'sort_sql': {'id': 'CAST(substr("id", 1, 4) || substr("id", 6) AS INTEGER)',
+                                'year': 'CAST("year" AS INTEGER)'},
+                   'column_kinds': {'id': 'student_id', 'year': 'int'}}
+
+college_db = open_table('colleges.csv', COLLEGE_FIELDS, **COLLEGE_OPTIONS)
+program_db = open_table('programs.csv', PROGRAM_FIELDS, **PROGRAM_OPTIONS)
+student_db = open_table('students.csv', STUDENT_FIELDS, **STUDENT_OPTIONS)
+
+def rename_college(old, new, cascade=True):
+    """Rename a college code, moving its programs along (see rename_key)."""
+    return rename_key(college_db, old, new, [(program_db, 'college_code')], cascade)
+
+def rename_program(old, new, cascade=True):
+    """Rename a program code, moving its students along (see rename_key)."""
+    return rename_key(program_db, old, new, [(student_db, 'program_code')], cascade)
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+def _projected(records, fieldnames):
+    # one small list per record, never the whole result set at once
+    for record in records:
+        yield [record.get(f, '') for f in fieldnames]
+
+def _csv_rows(records, fieldnames):
+    yield fieldnames
+    yield from _projected(records, fieldnames)
+
+def _jsonl_lines(records, fieldnames):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    # the keys are the same on every line, so only the values get encoded per record
+    keys = [encode(f) + ': ' for f in fieldnames]
+    for values in _projected(records, fieldnames):
+        yield '{' + ', '.join([k + encode(v) for k, v in zip(keys, values)]) + '}\n'
+
+def _json_lines(records, fieldnames):
+    # a json array, still written one record per line
+    first = True
+    for line in _jsonl_lines(records, fieldnames):
+        yield ('[' if first else ',') + line
+        first = False
+    yield ']\n' if not first else '[]\n'
+
+def format_for(path):
+    """Guess the export format from a file name; CSV unless it ends in .json or .jsonl."""
+    ext = os.path.splitext(path)[1].lower()
+    return {'.json': 'json', '.jsonl': 'jsonl'}.get(ext, 'csv')
+
+def write_records(records, fieldnames, f, fmt='csv'):
+    """Stream records to an open text file as CSV, a JSON array or JSON Lines.
+
+    Returns the number of records written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+
+    written = 0
+    def counted(records):
+        nonlocal written
+        for record in records:
+            written += 1
+            yield record
+
+    if fmt == 'csv':
+        csv.writer(f).writerows(_csv_rows(counted(records), fieldnames))
+    elif fmt == 'json':
+        f.writelines(_json_lines(counted(records), fieldnames))
+    else:
+        f.writelines(_jsonl_lines(counted(records), fieldnames))
+    return written
+
+def export_records(records, fieldnames, path, fmt=None):
+    """Stream records (any iterable of dicts) to path, see write_records.
+
+    Records are written one at a time as they are pulled from the iterable,
+    so memory use doesn't grow with the size of the export. The file is
+    written under a temporary name and renamed into place when complete.
+    Returns the number of records written.
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, mode = 'w', newline='', encoding='utf-8') as f:
+            written = write_records(records, fieldnames, f, fmt)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return written
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+# how long to wait for another process to finish writing before giving up
+LOCK_TIMEOUT = 10.0
+POLL_INTERVAL = 0.01
+
+class FileLock:
+    """An exclusive advisory lock shared between processes, held on a lock file.
+
+    Uses flock on POSIX and msvcrt.locking on Windows. Only writers take it;
+    readers never wait on it. The lock is re-entrant within a process, so a
+    write method can call another one while holding it. The lock file
+    itself is left in place, deleting it would let two processes lock
+    different files.
+    """
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+        self._depth = 0
+        self._owner = threading.RLock()
+
+    def _try_lock(self, fd):
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        self._owner.acquire()
+        if self._depth:
+            self._depth += 1
+            return
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock(fd):
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Timed out waiting for another process to release {self.path}")
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            self._owner.release()
+            raise
+        self._fd = fd
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if not self._depth:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._owner.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -1,9 +1,32 @@
+import time
+
+# taken before the heavy imports, for the time-to-first-paint metric
+STARTED = time.perf_counter()
+
 import customtkinter as ctk
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from tkinter import ttk, messagebox, Listbox, Toplevel, BooleanVar
 import data_handler as dh
+import metrics
+from prefix_index import PrefixIndex
 
 active_dropdowns = []
 
+# how often (ms) the tk thread checks on work handed to the worker pool
+WORKER_POLL_MS = 15
+
+# the combobox waits this long (ms) after the last keystroke before filtering
+COMBO_DEBOUNCE_MS = 120
+# choices added to the dropdown list at a time; more are added as it is scrolled
+COMBO_PAGE_SIZE = 100
+
+# how often (ms) the data files are checked for changes made by other instances or scripts
+WATCH_POLL_MS = 1000
+
+# rows put on screen straight away, before the rest of the student table has loaded
+FIRST_SCREEN_ROWS = 40
+
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("green")
 
@@ -12,6 +35,11 @@ class SearchableCombobox(ctk.CTkFrame):
     
     provides a text entry field with searchable dropdown list that filters
     options based on user input.
+
+    matching goes through a PrefixIndex built once per set_items, typing is
+    debounced, and the list only holds a page of matches at a time, growing
+    as it is scrolled to the bottom. the listbox is patched rather than
+    refilled when the matches change.
     """
     def __init__(self, parent, placeholder_text="Select...", width=200, height=30, dropdown_height=150, **kwargs):
         super().__init__(parent, fg_color="transparent")
@@ -22,7 +50,12 @@ class SearchableCombobox(ctk.CTkFrame):
         self.placeholder_text = placeholder_text
         self.selected_value = ""
         self.items = []
+        self.index = PrefixIndex()
         self.filtered_items = []
+        self.matches = iter(())
+        self.more_matches = False
+        self.shown = []
+        self.pending_filter = None
         self.dropdown_window = None
         self.listbox = None
         
@@ -35,8 +68,10 @@ class SearchableCombobox(ctk.CTkFrame):
         self.entry.bind("<Down>", self.on_arrow_down)
         
     def set_items(self, items):
-        self.items = items
-        self.filtered_items = items
+        if items != self.items:
+            self.items = list(items)
+            self.index = PrefixIndex(self.items)
+        self.filter_items()
         
     def get(self):
         return self.selected_value if self.selected_value else self.entry.get()
@@ -48,18 +83,51 @@ class SearchableCombobox(ctk.CTkFrame):
             self.entry.insert(0, value)
         
     def on_key_release(self, event):
-        search_text = self.entry.get().lower()
-        self.filtered_items = [item for item in self.items if search_text in item.lower()]
-        if self.dropdown_window and self.dropdown_window.winfo_exists():
-            self.update_listbox()
-        else:
+        # only filter once typing pauses
+        if self.pending_filter is not None:
+            self.after_cancel(self.pending_filter)
+        self.pending_filter = self.after(COMBO_DEBOUNCE_MS, self.on_filter_timer)
+
+    def on_filter_timer(self):
+        self.pending_filter = None
+        self.filter_items(self.entry.get())
+        # don't reopen the list if the user has moved on in the meantime
+        if self.entry_has_focus() and not (self.dropdown_window and self.dropdown_window.winfo_exists()):
             self.show_dropdown()
+
+    def cancel_filter(self):
+        if self.pending_filter is not None:
+            self.after_cancel(self.pending_filter)
+            self.pending_filter = None
+
+    def entry_has_focus(self):
+        # the ctk entry wraps a tk entry, which is the widget that takes focus
+        focused = str(self.tk.call("focus"))
+        return focused == str(self.entry) or focused.startswith(str(self.entry) + ".")
+
+    def filter_items(self, search_text=""):
+        self.matches = self.index.matches(search_text)
+        self.filtered_items = []
+        self.more_matches = True
+        self.load_more()
+
+    def load_more(self):
+        if not self.more_matches:
+            return
+        page = list(islice(self.matches, COMBO_PAGE_SIZE))
+        self.more_matches = len(page) == COMBO_PAGE_SIZE
+        self.filtered_items = self.filtered_items + page
+        self.update_listbox()
             
     def on_focus_in(self, event):
         if not self.dropdown_window or not self.dropdown_window.winfo_exists():
             self.show_dropdown()
             
     def on_enter(self, event):
+        if self.pending_filter is not None:
+            # enter beat the debounce, filter on what was typed so far
+            self.cancel_filter()
+            self.filter_items(self.entry.get())
         if self.filtered_items:
             self.set(self.filtered_items[0])
             self.hide_dropdown()
@@ -99,8 +167,15 @@ class SearchableCombobox(ctk.CTkFrame):
         
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        
-        self.listbox = Listbox(list_frame, yscrollcommand=scrollbar.set, 
+
+        def on_listbox_scroll(first, last):
+            scrollbar.set(first, last)
+            # reaching the bottom pulls in the next page of matches
+            if float(last) >= 1.0 and self.more_matches:
+                self.after_idle(self.load_more)
+
+        self.shown = []
+        self.listbox = Listbox(list_frame, yscrollcommand=on_listbox_scroll, 
                               bg="#2b2b2b", fg="white", selectbackground="#2a942a",
                               activestyle="none", highlightthickness=0, borderwidth=0,
                               font=("Roboto", 10))
@@ -116,6 +191,8 @@ class SearchableCombobox(ctk.CTkFrame):
         self.dropdown_window.focus_set()
         
     def hide_dropdown(self):
+        # a filter still waiting on the debounce would reopen the list
+        self.cancel_filter()
         if self.dropdown_window and self.dropdown_window.winfo_exists():
             if self in active_dropdowns:
                 active_dropdowns.remove(self)
@@ -126,13 +203,25 @@ class SearchableCombobox(ctk.CTkFrame):
     def update_listbox(self):
         if not self.listbox:
             return
-            
-        self.listbox.delete(0, "end")
-        for item in self.filtered_items:
-            self.listbox.insert("end", item)
+
+        # only touch the entries between the unchanged head and tail
+        old, new = self.shown, self.filtered_items
+        head = 0
+        limit = min(len(old), len(new))
+        while head < limit and old[head] == new[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+            tail += 1
+        if head < len(old) - tail:
+            self.listbox.delete(head, len(old) - tail - 1)
+        if head < len(new) - tail:
+            self.listbox.insert(head, *new[head:len(new) - tail])
+        self.shown = list(new)
             
     def on_listbox_select(self, event):
         if self.listbox.curselection():
+            self.cancel_filter()
             selected = self.listbox.get(self.listbox.curselection())
             self.set(selected)
             self.hide_dropdown()
@@ -154,6 +243,257 @@ class SearchableCombobox(ctk.CTkFrame):
         self.listbox.selection_clear(0, "end")
         
 
+class TreeSync:
+    """keeps a ttk.Treeview in step with a list of records.
+
+    items are keyed by the record's primary key (iid = student id, program
+    code, ...), so a refresh only inserts, updates or deletes the rows that
+    actually changed, and a new ordering is applied by moving existing items.
+    """
+    def __init__(self, tree, key, fields):
+        self.tree = tree
+        self.key = key
+        self.fields = fields
+        self.rows = []
+        self.order = []
+        self.shown = {}
+
+    def iids_for(self, rows):
+        iids = []
+        seen = set()
+        for row in rows:
+            iid = str(row[self.key])
+            # tolerate duplicate keys in hand-edited files
+            if iid in seen:
+                n = 2
+                while f"{iid}#{n}" in seen:
+                    n += 1
+                iid = f"{iid}#{n}"
+            seen.add(iid)
+            iids.append(iid)
+        return iids
+
+    def sync(self, rows):
+        new_order = self.iids_for(rows)
+        new_values = {iid: tuple(str(row[f]) for f in self.fields) for iid, row in zip(new_order, rows)}
+
+        for iid in self.order:
+            if iid not in new_values:
+                self.tree.delete(iid)
+                del self.shown[iid]
+
+        kept = [iid for iid in self.order if iid in new_values]
+        reorder = kept != [iid for iid in new_order if iid in self.shown]
+
+        for index, iid in enumerate(new_order):
+            values = new_values[iid]
+            old = self.shown.get(iid)
+            if old is None:
+                self.tree.insert("", index, iid=iid, values=values)
+            elif old != values:
+                self.tree.item(iid, values=values)
+            self.shown[iid] = values
+
+        if reorder:
+            for index, iid in enumerate(new_order):
+                self.tree.move(iid, "", index)
+
+        self.rows = rows
+        self.order = new_order
+
+
+class VirtualTreeview(ctk.CTkFrame):
+    """a treeview that only creates items for the rows currently in view.
+
+    the full result set is kept as a python list of record dicts in
+    self.rows; the underlying ttk.Treeview only ever holds the visible
+    window plus a few buffer rows, and the scrollbar is driven by the
+    position of that window in the full list.
+
+    the selection is kept here too, as a set of keys, so rows picked with
+    ctrl/shift-click (or ctrl+a) stay selected while scrolled out of the
+    window. <<SelectionChanged>> is generated on the tree when it changes.
+    """
+    def __init__(self, parent, columns, key, fields, buffer=5, **kwargs):
+        super().__init__(parent, fg_color="transparent")
+
+        self.columns = columns
+        self.fields = fields
+        self.buffer = buffer
+        self.rows = []
+        self.offset = 0
+        self.selected = set()
+        # whether the click or key behind the next selection change held ctrl/shift
+        self.extend = False
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="extended")
+        self.window = TreeSync(self.tree, key, fields)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", lambda e: self.render())
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Up>", self.on_arrow)
+        self.tree.bind("<Down>", self.on_arrow)
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.visible_count()) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.visible_count()) or "break")
+        self.tree.bind("<Button-1>", self.on_click, add="+")
+        self.tree.bind("<KeyPress>", self.note_modifiers, add="+")
+        self.tree.bind("<Control-a>", lambda e: self.select_all() or "break")
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+    def visible_count(self):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        # leave room for the heading row
+        height = self.tree.winfo_height() - rowheight
+        return max(1, height // rowheight)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.offset = min(self.offset, max(0, len(rows) - self.visible_count()))
+        if self.selected:
+            # rows searched or filtered away don't stay selected
+            kept = self.selected & set(self.window.iids_for(rows))
+            if kept != self.selected:
+                self.selected = kept
+                self.tree.event_generate("<<SelectionChanged>>")
+        self.render()
+
+    def render(self):
+        visible = self.visible_count()
+        self.window.sync(self.rows[self.offset:self.offset + visible + self.buffer])
+        want = [iid for iid in self.window.order if iid in self.selected]
+        if set(want) != set(self.tree.selection()):
+            self.tree.selection_set(want)
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.visible_count()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, amount):
+        self.scroll_to(self.offset + amount)
+
+    def on_scroll(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_count()
+            self.scroll_by(amount)
+
+    def on_mousewheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def note_modifiers(self, event):
+        # shift is 0x1 and control 0x4 in event.state
+        self.extend = bool(event.state & 0x5)
+
+    def on_click(self, event):
+        self.note_modifiers(event)
+        iid = self.tree.identify_row(event.y)
+        if iid and not self.extend and self.tree.identify_region(event.x, event.y) in ("cell", "tree"):
+            # a plain click replaces the whole selection, rows scrolled out of view included;
+            # done here because the tree's own event can't be told from render() restoring it
+            self.replace_selection({iid})
+
+    def replace_selection(self, keys):
+        if keys != self.selected:
+            self.selected = keys
+            self.tree.event_generate("<<SelectionChanged>>")
+
+    def on_select(self, event):
+        window = set(self.window.order)
+        picked = set(self.tree.selection())
+        if picked == window & self.selected:
+            # render() putting the selection back on the items it made, or a plain click already handled
+            return
+        if self.extend:
+            self.selected = (self.selected - window) | picked
+        else:
+            self.selected = picked
+        self.tree.event_generate("<<SelectionChanged>>")
+
+    def select_all(self):
+        self.selected = set(self.window.iids_for(self.rows))
+        self.render()
+        self.tree.event_generate("<<SelectionChanged>>")
+
+    def clear_selection(self):
+        if self.selected:
+            self.selected = set()
+            self.render()
+            self.tree.event_generate("<<SelectionChanged>>")
+
+    def selected_rows(self):
+        """the selected records, in the order they are shown."""
+        if not self.selected:
+            return []
+        return [row for row, iid in zip(self.rows, self.window.iids_for(self.rows)) if iid in self.selected]
+
+    def on_arrow(self, event):
+        # keep keyboard navigation going past the edges of the rendered window
+        self.note_modifiers(event)
+        children = self.tree.get_children()
+        selected = self.tree.selection()
+        if not children or not selected:
+            return
+        index = children.index(selected[0])
+        if event.keysym == "Down" and index >= self.visible_count() - 1:
+            self.scroll_by(1)
+            children = self.tree.get_children()
+            target = children[min(index, len(children) - 1)]
+        elif event.keysym == "Up" and index == 0 and self.offset > 0:
+            self.scroll_by(-1)
+            target = self.tree.get_children()[0]
+        else:
+            # the tree moves the selection itself; a plain arrow leaves just that row selected
+            item = self.tree.focus() or selected[0]
+            target = self.tree.next(item) if event.keysym == "Down" else self.tree.prev(item)
+            if target and not self.extend:
+                self.replace_selection({target})
+            return
+        self.tree.selection_set(target)
+        self.tree.focus(target)
+        return "break"
+
+
+def apply_changes(rows, changes, key, add=True):
+    """return rows with the removed records dropped, the updated ones swapped in and, if add, the added ones on top.
+
+    rows from a search, filter or sort may be copies of the stored records
+    (the sqlite backend builds fresh ones), so edits are matched by key.
+    """
+    if changes.removed:
+        rows = [r for r in rows if r[key] not in changes.removed]
+    if changes.updated:
+        updated = {r[key]: r for r in changes.updated}
+        rows = [updated.get(r[key], r) for r in rows]
+    if add and changes.added:
+        shown = {r[key] for r in rows}
+        rows = [r for r in changes.added if r[key] not in shown] + rows
+    return rows
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
 class SISApp(ctk.CTk):
     """Student Information System Application.
     
@@ -187,14 +527,172 @@ class SISApp(ctk.CTk):
         self.prog_filter_window = None
         self.stud_filter_window = None
 
-        self.setup_college_ui()
-        self.setup_program_ui()
-        self.setup_student_ui()
+        # data work runs off the tk thread; one pending request per channel
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sis-worker")
+        self.pending = {}
+        self.generations = {}
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # users land on the students tab; the other two are built when first opened
+        self.built_tabs = set()
+        self.build_tab("Students")
         
         # dropdown behavior
         self.bind_all("<Button-1>", self.on_global_click)
         self.last_focused_entry = None
-        
+
+        self.stats_window = None
+        self.bind_all("<F12>", lambda event: self.open_stats_window())
+
+        self.first_paint_ms = None
+        self.after(0, self.report_first_paint)
+        self.after(WATCH_POLL_MS, self.watch_files)
+
+    def build_tab(self, tab):
+        if tab in self.built_tabs:
+            return
+        self.built_tabs.add(tab)
+        {"Students": self.setup_student_ui,
+         "Programs": self.setup_program_ui,
+         "Colleges": self.setup_college_ui}[tab]()
+
+    def report_first_paint(self):
+        # runs from the event loop once the window has been laid out and drawn
+        self.update_idletasks()
+        self.first_paint_ms = (time.perf_counter() - STARTED) * 1000
+        metrics.record("SISApp.first_paint", self.first_paint_ms / 1000)
+
+    def open_stats_window(self):
+        """show the timings collected by the metrics module (F12)."""
+        if self.stats_window and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            self.fill_stats_window()
+            return
+
+        window = Toplevel(self)
+        window.title("Performance Stats")
+        window.geometry("760x360")
+        window.configure(bg='#2b2b2b')
+        self.stats_window = window
+
+        columns = ("Name", "Calls", "Avg ms", "Max ms", "Total ms", "Rows", "Read", "Written")
+        self.stats_tree = ttk.Treeview(window, columns=columns, show="headings")
+        for col in columns:
+            self.stats_tree.heading(col, text=col)
+            self.stats_tree.column(col, width=200 if col == "Name" else 70, anchor="w" if col == "Name" else "e")
+        self.stats_tree.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        self.stats_label = ctk.CTkLabel(window, text="")
+        self.stats_label.pack(side="left", padx=10, pady=10)
+        ctk.CTkButton(window, text="Refresh", width=80, command=self.fill_stats_window).pack(side="right", padx=10, pady=10)
+        ctk.CTkButton(window, text="Reset", width=80, fg_color="gray",
+                      command=lambda: (metrics.reset(), self.fill_stats_window())).pack(side="right", pady=10)
+        self.fill_stats_window()
+
+    def fill_stats_window(self):
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        if not metrics.enabled():
+            self.stats_label.configure(text="Metrics are off. Start the app with SIS_METRICS=1 to collect them.")
+            return
+        stats = metrics.snapshot()
+        for name in sorted(stats, key=lambda n: -stats[n]['total_ms']):
+            s = stats[name]
+            self.stats_tree.insert("", "end", values=(name, s['calls'], f"{s['avg_ms']:.1f}", f"{s['max_ms']:.1f}",
+                                                      f"{s['total_ms']:.0f}", s['rows'],
+                                                      format_bytes(s['bytes_read']), format_bytes(s['bytes_written'])))
+        self.stats_label.configure(text=f"Logging to {metrics.metrics_path()}")
+        
+    def on_close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
+    def run_in_background(self, channel, work, done):
+        """run work() on the worker pool and pass its result to done() on the tk thread.
+
+        a newer request on the same channel supersedes an older one: the old
+        future is cancelled if it hasn't started yet and its result is dropped
+        if it has. while a channel is busy its count label says so.
+        """
+        generation = self.generations.get(channel, 0) + 1
+        self.generations[channel] = generation
+
+        previous = self.pending.get(channel)
+        if previous is not None:
+            previous.cancel()
+
+        future = self.executor.submit(work)
+        future.started = time.perf_counter()
+        self.pending[channel] = future
+        self.show_busy(channel)
+        self.after(WORKER_POLL_MS, self.poll_background, channel, generation, future, done)
+
+    def poll_background(self, channel, generation, future, done):
+        if self.generations.get(channel) != generation:
+            # superseded, the newer request owns the channel now
+            return
+        if not future.done():
+            self.after(WORKER_POLL_MS, self.poll_background, channel, generation, future, done)
+            return
+
+        del self.pending[channel]
+        try:
+            result = future.result()
+        except Exception as e:
+            self.update_all_record_counts()
+            messagebox.showerror("Error", f"Failed to load {channel}: {str(e)}")
+            return
+        # from the request to the result reaching the tk thread, what the user waited
+        metrics.record(f"background.{channel}", time.perf_counter() - future.started,
+                       rows=len(result) if isinstance(result, list) else None)
+        done(result)
+
+    def watch_files(self):
+        """pick up changes other instances or scripts made to the data files.
+
+        checking is a few stat calls per table; only when a file moved on is
+        it read (on the worker pool, just the new journal lines when that's
+        all that changed) and only the rows that differ are pushed into the
+        tables and dropdowns.
+        """
+        for name, table, apply in (("colleges", dh.college_db, self.apply_college_changes),
+                                   ("programs", dh.program_db, self.apply_program_changes),
+                                   ("students", dh.student_db, self.apply_student_changes)):
+            channel = f"{name} from disk"
+            if channel not in self.pending and table.changed():
+                self.run_in_background(channel, table.refresh, apply)
+        self.after(WATCH_POLL_MS, self.watch_files)
+
+    def apply_college_changes(self, changes):
+        if changes is None:
+            return
+        if "Colleges" in self.built_tabs:
+            self.college_sync.sync(apply_changes(self.college_sync.rows, changes, 'code'))
+        self.update_college_dropdown()
+        self.update_all_record_counts()
+
+    def apply_program_changes(self, changes):
+        if changes is None:
+            return
+        if "Programs" in self.built_tabs:
+            # new programs only join the list when it isn't searched or filtered
+            rows = apply_changes(self.program_sync.rows, changes, 'code', add=self.filtered_program_count is None)
+            self.program_sync.sync(rows)
+        if changes.added or changes.removed:
+            self.update_program_dropdown()
+        self.update_all_record_counts()
+
+    def apply_student_changes(self, changes):
+        if changes is None:
+            return
+        rows = apply_changes(self.student_table.rows, changes, 'id', add=self.filtered_student_count is None)
+        self.student_table.set_rows(rows)
+        self.update_all_record_counts()
+
+    def show_busy(self, channel):
+        label = {'students': self.student_count_label, 'programs': self.program_count_label}.get(channel)
+        if label:
+            label.configure(text="Working...")
+
     def reset_focus_state(self):
         # clear focus from all widgets by setting focus to main window
         self.focus_set()
@@ -240,29 +738,48 @@ class SISApp(ctk.CTk):
                   background=[("active", "#4a4a4a")],
                   foreground=[("active", "white")])
 
+    @metrics.instrument
     def update_all_record_counts(self):
-        # update college count
+        # totals are counters kept by the data stores, filtered counts are the
+        # length of the result set the table is showing; nothing gets reloaded
         if self.college_count_label:
-            college_count = len(dh.college_db.load_data())
+            college_count = dh.college_db.count()
             self.college_count_label.configure(text=f"Total Records: {college_count}")
         
         # update program count
-        if self.program_count_label:
-            if hasattr(self, 'filtered_program_count') and self.filtered_program_count is not None:
-                total_program_count = len(dh.program_db.load_data())
-                self.program_count_label.configure(text=f"Showing: {self.filtered_program_count} / {total_program_count} records")
+        if self.program_count_label and 'programs' not in self.pending:
+            total_program_count = dh.program_db.count()
+            if self.filtered_program_count is not None:
+                self.program_count_label.configure(text=f"Showing: {len(self.program_sync.rows)} / {total_program_count} records")
             else:
-                program_count = len(dh.program_db.load_data())
-                self.program_count_label.configure(text=f"Total Records: {program_count}")
+                self.program_count_label.configure(text=f"Total Records: {total_program_count}")
         
         # update student count
-        if self.student_count_label:
-            if hasattr(self, 'filtered_student_count') and self.filtered_student_count is not None:
-                total_student_count = len(dh.student_db.load_data())
-                self.student_count_label.configure(text=f"Showing: {self.filtered_student_count} / {total_student_count} records")
+        if self.student_count_label and 'students' not in self.pending:
+            total_student_count = dh.student_db.count()
+            if self.filtered_student_count is not None:
+                self.student_count_label.configure(text=f"Showing: {len(self.student_table.rows)} / {total_student_count} records")
             else:
-                student_count = len(dh.student_db.load_data())
-                self.student_count_label.configure(text=f"Total Records: {student_count}")
+                self.student_count_label.configure(text=f"Total Records: {total_student_count}")
+
+    def export_view(self, title, rows, fieldnames):
+        """save the rows a tab is showing (searched, filtered, sorted) to a file.
+
+        rows is the list the tab already holds, streamed straight to disk by
+        the worker; nothing is read back out of the treeview.
+        """
+        from tkinter import filedialog
+        import export
+
+        path = filedialog.asksaveasfilename(title=f"Export {title}", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+
+        def done(count):
+            messagebox.showinfo("Export", f"Exported {count} {title.lower()} to {path}")
+
+        self.run_in_background(f'{title.lower()} export', lambda: export.export_records(rows, fieldnames, path), done)
 
     # COLLEGES SECTION
 
@@ -307,11 +824,17 @@ class SISApp(ctk.CTk):
                                                 font=("Roboto", 12, "bold"), text_color="#2a942a")
         self.college_count_label.grid(row=1, column=1, sticky="e", padx=5, pady=5)
 
+        ctk.CTkButton(table_frame, text="Export", width=50,
+                      command=lambda: self.export_view("Colleges", self.college_sync.rows, dh.COLLEGE_FIELDS)
+                      ).grid(row=1, column=0, sticky="w", padx=5, pady=5)
+
         self.college_tree = ttk.Treeview(table_frame, columns=("Code", "Name"), show="headings")
         self.college_tree.heading("Code", text="College Code")
         self.college_tree.heading("Name", text="College Name")
         self.college_tree.grid(row=0, column=0, columnspan=2, sticky="nsew", padx=5, pady=5)
         self.college_tree.bind("<<TreeviewSelect>>", self.on_college_select)
+        self.college_sync = TreeSync(self.college_tree, 'code', dh.COLLEGE_FIELDS)
+        self.selected_college_code = None
         
         self.refresh_college_table()
         self.update_all_record_counts()
@@ -328,13 +851,11 @@ class SISApp(ctk.CTk):
                 messagebox.showerror("Error", "College code must be alphanumeric!")
                 return
             
-            data = dh.college_db.load_data()
-            if any(c['code'] == code for c in data):
+            if dh.college_db.exists(code):
                 messagebox.showerror("Error", "College Code already exists!")
                 return
             
-            data.insert(0, {'code': code, 'name': name})
-            dh.college_db.save_data(data)
+            dh.college_db.insert({'code': code, 'name': name})
             self.refresh_college_table()
             self.update_college_dropdown()
             self.update_all_record_counts()
@@ -344,23 +865,23 @@ class SISApp(ctk.CTk):
             messagebox.showerror("Error", f"Failed to add college: {str(e)}")
 
     def update_college(self):
-        code = self.entry_college_code.get().strip()
+        # codes are stored upper case, so retyping one in lower case isn't a rename
+        code = self.entry_college_code.get().strip().upper()
         name = self.entry_college_name.get().strip()
         if not code or not name:
             messagebox.showerror("Error", "All fields are required!")
             return
+
+        original = self.selected_college_code
+        if original and code != original:
+            self.rename_college(original, code, name)
+            return
         
-        data = dh.college_db.load_data()
-        changed = False
-        for c in data:
-            if c['code'] == code:
-                if c['name'] != name:
-                    c['name'] = name
-                    changed = True
-                break
+        current = dh.college_db.get(code)
+        changed = current is not None and current['name'] != name
         
         if changed:
-            dh.college_db.save_data(data)
+            dh.college_db.update({'code': code, 'name': name})
             self.refresh_college_table()
             self.update_college_dropdown()
             self.update_all_record_counts()
@@ -368,28 +889,57 @@ class SISApp(ctk.CTk):
         self.clear_college_fields()
 
     def delete_college(self):
-        code = self.entry_college_code.get().strip()
+        # the selected row, not whatever has been typed into the editable code entry
+        code = self.selected_college_code
         if not code:
             return
         
         # check if college is being used by programs (might change this to allow for deletion even if)
-        programs = dh.program_db.load_data()
-        if any(p['college_code'] == code for p in programs):
+        if dh.program_db.has_references('college_code', code):
             messagebox.showerror("Error", "Cannot delete. College has programs!")
             return
             
         if messagebox.askyesno("Confirm", f"Delete college {code}?"):
-            data = dh.college_db.load_data()
-            new_data = [c for c in data if c['code'] != code]
-            dh.college_db.save_data(new_data)
+            dh.college_db.delete(code)
             self.refresh_college_table()
             self.update_college_dropdown()
             self.update_all_record_counts()
             messagebox.showinfo("College Deleted", "College deleted successfully!")
             self.clear_college_fields()
 
+    def rename_college(self, old, new, name):
+        """change a college's code, moving its programs to the new code as well."""
+        if not new.isalnum():
+            messagebox.showerror("Error", "College code must be alphanumeric!")
+            return
+        if dh.college_db.exists(new):
+            messagebox.showerror("Error", "College Code already exists!")
+            return
+        programs = len(dh.program_db.referencing('college_code', old))
+        question = f"Rename college {old} to {new}?"
+        if programs:
+            question += f"\n\nIts {programs} programs will be moved to {new} as well."
+        if not messagebox.askyesno("Confirm", question):
+            return
+
+        def work():
+            dh.rename_college(old, new)
+            if dh.college_db.get(new)['name'] != name:
+                dh.college_db.update({'code': new, 'name': name})
+
+        def done(result):
+            self.refresh_college_table()
+            self.update_college_dropdown()
+            if "Programs" in self.built_tabs:
+                self.refresh_program_table()
+            self.update_all_record_counts()
+            messagebox.showinfo("College Renamed", f"College {old} is now {new}.")
+            self.clear_college_fields()
+
+        self.run_in_background('rename', work, done)
+
     def clear_college_fields(self):
-        self.entry_college_code.configure(state="normal")
+        self.selected_college_code = None
         self.entry_college_code.delete(0, 'end')
         self.entry_college_name.delete(0, 'end')
 
@@ -401,15 +951,14 @@ class SISApp(ctk.CTk):
         self.clear_college_fields()
         self.entry_college_code.delete(0, 'end')
         self.entry_college_code.insert(0, val[0])
-        self.entry_college_code.configure(state="disabled")
+        # editing the code renames the college on update
+        self.selected_college_code = str(val[0])
         self.entry_college_name.delete(0, 'end')
         self.entry_college_name.insert(0, val[1])
 
+    @metrics.instrument
     def refresh_college_table(self):
-        for item in self.college_tree.get_children():
-            self.college_tree.delete(item)
-        for college in dh.college_db.load_data():
-            self.college_tree.insert("", "end", values=(college['code'], college['name']))
+        self.college_sync.sync(dh.college_db.load_data())
 
     # PROGRAMS SECTION
 
@@ -452,7 +1001,11 @@ class SISApp(ctk.CTk):
         self.entry_prog_search.bind("<KeyRelease>", self.search_program)
 
         filter_button = ctk.CTkButton(search_filter_frame, text="Filter", command=self.open_filter_window_prog, width=50)
-        filter_button.pack(side="right", padx=10, pady=10)
+        filter_button.pack(side="left", padx=(10, 0), pady=10)
+
+        export_button = ctk.CTkButton(search_filter_frame, text="Export", width=50,
+                                      command=lambda: self.export_view("Programs", self.program_sync.rows, dh.PROGRAM_FIELDS))
+        export_button.pack(side="left", padx=10, pady=10)
         
         # program list
         tree_container = ctk.CTkFrame(table_frame)
@@ -474,6 +1027,8 @@ class SISApp(ctk.CTk):
             self.program_tree.column(col, width=100)
         
         self.program_tree.bind("<<TreeviewSelect>>", self.on_program_select)
+        self.program_sync = TreeSync(self.program_tree, 'code', dh.PROGRAM_FIELDS)
+        self.selected_program_code = None
         self.refresh_program_table()
         self.update_college_dropdown()
         self.update_all_record_counts()
@@ -489,12 +1044,10 @@ class SISApp(ctk.CTk):
                 messagebox.showerror("Error", "Program code must be alphanumeric!")
                 return
                 
-            data = dh.program_db.load_data()
-            if any(p['code'] == code for p in data):
+            if dh.program_db.exists(code):
                 messagebox.showerror("Error", "Program Code exists!")
                 return
-            data.insert(0, {'code': code, 'name': name, 'college_code': coll})
-            dh.program_db.save_data(data)
+            dh.program_db.insert({'code': code, 'name': name, 'college_code': coll})
             self.refresh_program_table()
             self.update_program_dropdown()
             self.update_all_record_counts()
@@ -504,25 +1057,25 @@ class SISApp(ctk.CTk):
             messagebox.showerror("Error", f"Failed to add program: {str(e)}")
 
     def update_program(self):
-        code = self.entry_prog_code.get().strip()
+        # codes are stored upper case, so retyping one in lower case isn't a rename
+        code = self.entry_prog_code.get().strip().upper()
         name = self.entry_prog_name.get().strip()
         coll = self.combo_prog_college.get()
         
         if not all([code, name, coll]) or coll == "Select College":
             messagebox.showerror("Error", "All fields required!")
             return
+
+        original = self.selected_program_code
+        if original and code != original:
+            self.rename_program(original, code, name, coll)
+            return
             
-        data = dh.program_db.load_data()
-        changed = False
-        for p in data:
-            if p['code'] == code:
-                if p['name'] != name or p['college_code'] != coll:
-                    p['name'], p['college_code'] = name, coll
-                    changed = True
-                break
+        current = dh.program_db.get(code)
+        changed = current is not None and (current['name'] != name or current['college_code'] != coll)
         
         if changed:
-            dh.program_db.save_data(data)
+            dh.program_db.update({'code': code, 'name': name, 'college_code': coll})
             self.refresh_program_table()
             self.update_program_dropdown()
             self.update_all_record_counts()
@@ -530,27 +1083,57 @@ class SISApp(ctk.CTk):
         self.clear_program_fields()
 
     def delete_program(self):
-        code = self.entry_prog_code.get().strip()
+        # the selected row, not whatever has been typed into the editable code entry
+        code = self.selected_program_code
         if not code:
             return
             
-        students = dh.student_db.load_data()
-        if any(s['program_code'] == code for s in students):
+        if dh.student_db.has_references('program_code', code):
             messagebox.showerror("Error", "Cannot delete. Students enrolled!")
             return
             
         if messagebox.askyesno("Confirm", f"Delete program {code}?"):
-            data = dh.program_db.load_data()
-            new_data = [p for p in data if p['code'] != code]
-            dh.program_db.save_data(new_data)
+            dh.program_db.delete(code)
             self.refresh_program_table()
             self.update_program_dropdown()
             self.update_all_record_counts()
             messagebox.showinfo("Program Deleted", "Program deleted successfully!")
             self.clear_program_fields()
 
+    def rename_program(self, old, new, name, coll):
+        """change a program's code, moving its students to the new code as well."""
+        if not new.isalnum():
+            messagebox.showerror("Error", "Program code must be alphanumeric!")
+            return
+        if dh.program_db.exists(new):
+            messagebox.showerror("Error", "Program Code exists!")
+            return
+        students = len(dh.student_db.referencing('program_code', old))
+        question = f"Rename program {old} to {new}?"
+        if students:
+            question += f"\n\nIts {students} students will be moved to {new} as well."
+        if not messagebox.askyesno("Confirm", question):
+            return
+
+        def work():
+            # one pass over students.csv whatever the number of students
+            dh.rename_program(old, new)
+            current = dh.program_db.get(new)
+            if current['name'] != name or current['college_code'] != coll:
+                dh.program_db.update({'code': new, 'name': name, 'college_code': coll})
+
+        def done(result):
+            self.refresh_program_table()
+            self.update_program_dropdown()
+            self.refresh_student_table()
+            self.update_all_record_counts()
+            messagebox.showinfo("Program Renamed", f"Program {old} is now {new}.")
+            self.clear_program_fields()
+
+        self.run_in_background('rename', work, done)
+
     def clear_program_fields(self):
-        self.entry_prog_code.configure(state="normal")
+        self.selected_program_code = None
         self.entry_prog_code.delete(0, 'end')
         self.entry_prog_name.delete(0, 'end')
         self.combo_prog_college.set('Select College')
@@ -563,38 +1146,38 @@ class SISApp(ctk.CTk):
         self.clear_program_fields()
         self.entry_prog_code.delete(0, 'end')
         self.entry_prog_code.insert(0, val[0])
-        self.entry_prog_code.configure(state="disabled")
+        # editing the code renames the program on update
+        self.selected_program_code = str(val[0])
         self.entry_prog_name.delete(0, 'end')
         self.entry_prog_name.insert(0, val[1])
         self.combo_prog_college.set(val[2])
 
     def update_college_dropdown(self):
+        if "Programs" not in self.built_tabs:
+            # the dropdown is filled when the tab gets built
+            return
         codes = [c['code'] for c in dh.college_db.load_data()]
         self.combo_prog_college.configure(values=codes if codes else ["No Colleges"])
 
+    @metrics.instrument
     def refresh_program_table(self):
-        for item in self.program_tree.get_children():
-            self.program_tree.delete(item)
-        for p in dh.program_db.load_data():
-            self.program_tree.insert("", "end", values=(p['code'], p['name'], p['college_code']))
+        self.run_in_background('programs', dh.program_db.load_data, self.show_programs)
+
+    def show_programs(self, rows):
+        self.program_sync.sync(rows)
+        self.update_all_record_counts()
 
     def search_program(self, event):
         query = self.entry_prog_search.get().lower()
-        for item in self.program_tree.get_children():
-            self.program_tree.delete(item)
-        
-        search_results = []
-        for p in dh.program_db.load_data():
-            if any(query in str(v).lower() for v in p.values()):
-                self.program_tree.insert("", "end", values=(p['code'], p['name'], p['college_code']))
-                search_results.append(p)
-        
-        if query:
-            self.filtered_program_count = len(search_results)
-        else:
-            self.filtered_program_count = None
-        
-        self.update_all_record_counts()
+
+        def done(search_results):
+            if query:
+                self.filtered_program_count = len(search_results)
+            else:
+                self.filtered_program_count = None
+            self.show_programs(search_results)
+
+        self.run_in_background('programs', lambda: dh.program_db.search(query), done)
 
     def sort_program_table(self, col, reverse):
         col_mapping = {
@@ -611,32 +1194,14 @@ class SISApp(ctk.CTk):
         self.program_tree.heading(col, text=col + arrow)
 
         # check if in a filtered state
+        # sorting only moves the items that are already in the tree
         if hasattr(self, 'filtered_program_count') and self.filtered_program_count is not None:
-            current_items = []
-            for item in self.program_tree.get_children():
-                values = self.program_tree.item(item)['values']
-                # create a dict with the same structure as database records
-                current_items.append({
-                    'code': values[0],
-                    'name': values[1], 
-                    'college_code': values[2]
-                })
-            
-            # sort the current items
-            current_items.sort(key=lambda x: str(x[db_field]), reverse=reverse)
-            
-            for item in self.program_tree.get_children():
-                self.program_tree.delete(item)
-            for p in current_items:
-                self.program_tree.insert("", "end", values=list(p.values()))
+            current_items = self.program_sync.rows
         else:
             # sort all data when not filtered
-            data = dh.program_db.load_data()
-            data.sort(key=lambda x: str(x[db_field]), reverse=reverse)
-            for item in self.program_tree.get_children():
-                self.program_tree.delete(item)
-            for p in data:
-                self.program_tree.insert("", "end", values=list(p.values()))
+            current_items = None
+        work = lambda: dh.program_db.sorted_records(db_field, reverse, subset=current_items)
+        self.run_in_background('programs', work, self.show_programs)
         
         self.program_tree.heading(col, command=lambda: self.sort_program_table(col, not reverse))
     
@@ -687,31 +1252,25 @@ class SISApp(ctk.CTk):
         ctk.CTkButton(button_frame, text="Cancel", command=filter_window.destroy, width=100).pack(side="left", padx=8)
 
     def apply_prog_filters(self, filter_window=None):
-        for item in self.program_tree.get_children():
-            self.program_tree.delete(item)
-    
-        programs = dh.program_db.load_data()
-        filtered_programs = []
-        
+        # tk variables can only be read here on the tk thread
         active_college_filters = []
         colleges = dh.college_db.load_data()
         for college in colleges:
             college_code = college['code']
-            if self.prog_filter_vars[f'prog_college_{college_code}'].get():
+            var = self.prog_filter_vars.get(f'prog_college_{college_code}')
+            if var is not None and var.get():
                 active_college_filters.append(college_code)
-        
-        if active_college_filters:
-            for program in programs:
-                if program['college_code'] in active_college_filters:
-                    filtered_programs.append(program)
-        else:
-            filtered_programs = programs
-        
-        for program in filtered_programs:
-            self.program_tree.insert("", "end", values=(program['code'], program['name'], program['college_code']))
 
-        self.filtered_program_count = len(filtered_programs)
-        self.update_all_record_counts()
+        def work():
+            if not active_college_filters:
+                return dh.program_db.load_data()
+            return dh.program_db.filter({'college_code': active_college_filters})
+
+        def done(filtered_programs):
+            self.filtered_program_count = len(filtered_programs)
+            self.show_programs(filtered_programs)
+
+        self.run_in_background('programs', work, done)
         
         if filter_window:
             filter_window.destroy()
@@ -754,7 +1313,11 @@ class SISApp(ctk.CTk):
         self.combo_stud_gender.set("Select Gender")
 
         self.create_button_frame(self.stud_form, self.add_student, self.update_student,
-                                self.delete_student, self.clear_student_fields)
+                                self.delete_student, self.clear_student_selection)
+
+        # ctrl/shift-click several students to update or delete them together
+        self.stud_selection_label = ctk.CTkLabel(self.stud_form, text="", text_color="#2a942a")
+        self.stud_selection_label.pack(pady=5)
 
         # right table & search
         right_frame = ctk.CTkFrame(self.student_tab)
@@ -776,17 +1339,21 @@ class SISApp(ctk.CTk):
         self.entry_search.bind("<KeyRelease>", self.search_student)
         
         filter_button = ctk.CTkButton(search_filter_frame, text="Filter", command=self.open_filter_window_stud, width=50)
-        filter_button.pack(side="right", padx=10, pady=10)
+        filter_button.pack(side="left", padx=(10, 0), pady=10)
+
+        export_button = ctk.CTkButton(search_filter_frame, text="Export", width=50,
+                                      command=lambda: self.export_view("Students", self.student_table.rows, dh.STUDENT_FIELDS))
+        export_button.pack(side="left", padx=10, pady=10)
 
         # student list
         tree_container = ctk.CTkFrame(right_frame)
         tree_container.grid(row=1, column=0, sticky="nsew")
 
-        self.student_tree = ttk.Treeview(tree_container, columns=("ID", "First Name", "Last Name", "Program", "Year", "Gender"), show="headings")
-        scrollbar = ttk.Scrollbar(tree_container, orient="vertical", command=self.student_tree.yview)
-        self.student_tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        self.student_tree.pack(side="left", fill="both", expand=True)
+        # only the visible rows are ever inserted into the treeview
+        self.student_table = VirtualTreeview(tree_container, columns=("ID", "First Name", "Last Name", "Program", "Year", "Gender"),
+                                             key='id', fields=dh.STUDENT_FIELDS)
+        self.student_table.pack(fill="both", expand=True)
+        self.student_tree = self.student_table.tree
 
         # record count label for students
         self.student_count_label = ctk.CTkLabel(right_frame, text="Total Records: 0", 
@@ -797,11 +1364,17 @@ class SISApp(ctk.CTk):
             self.student_tree.heading(col, text=col + " ↕", command=lambda c=col: self.sort_student_table(c, False))
             self.student_tree.column(col, width=100)
 
-        self.student_tree.bind("<<TreeviewSelect>>", self.on_student_select)
+        self.student_tree.bind("<<SelectionChanged>>", self.on_student_select)
+        # show the top of the table now and let the full load catch up in the background
+        first_screen = dh.student_db.head(FIRST_SCREEN_ROWS)
         self.refresh_student_table()
+        self.student_table.set_rows(first_screen)
         self.update_program_dropdown()
         self.update_all_record_counts() 
 
+        # have the search index ready before the first keystroke
+        self.executor.submit(dh.student_db.build_search_index)
+
     def add_student(self):
         try:
             sid = self.entry_stud_id.get().strip()
@@ -820,18 +1393,14 @@ class SISApp(ctk.CTk):
                 return
                 
             # check if the typed program exists
-            programs = dh.program_db.load_data()
-            program_codes = [p['code'] for p in programs]
-            if pr not in program_codes:
+            if not dh.program_db.exists(pr):
                 messagebox.showerror("Error", f"Program '{pr}' does not exist! Please select from the dropdown.")
                 return
                 
-            data = dh.student_db.load_data()
-            if any(s['id'] == sid for s in data):
+            if dh.student_db.exists(sid):
                 messagebox.showerror("Error", "ID exists!")
                 return
-            data.insert(0, {'id': sid, 'firstname': fn, 'lastname': ln, 'program_code': pr, 'year': yr, 'gender': gn})
-            dh.student_db.save_data(data)
+            dh.student_db.insert({'id': sid, 'firstname': fn, 'lastname': ln, 'program_code': pr, 'year': yr, 'gender': gn})
             self.refresh_student_table()
             self.update_all_record_counts()
             messagebox.showinfo("Student Added", "Student added successfully!")
@@ -840,6 +1409,9 @@ class SISApp(ctk.CTk):
             messagebox.showerror("Error", f"Failed to add student: {str(e)}")
 
     def update_student(self):
+        if len(self.student_table.selected) > 1:
+            self.update_selected_students()
+            return
         sid = self.entry_stud_id.get().strip()
         fn = self.entry_stud_fname.get().strip()
         ln = self.entry_stud_lname.get().strip()
@@ -851,36 +1423,78 @@ class SISApp(ctk.CTk):
             messagebox.showerror("Error", "All fields required!")
             return
             
-        data = dh.student_db.load_data()
-        changed = False
-        for s in data:
-            if s['id'] == sid:
-                if (s['firstname'] != fn or s['lastname'] != ln or 
-                    s['program_code'] != pr or s['year'] != yr or s['gender'] != gn):
-                    s.update({'firstname': fn, 'lastname': ln, 'program_code': pr, 'year': yr, 'gender': gn})
-                    changed = True
-                break
+        s = dh.student_db.get(sid)
+        changed = s is not None and (s['firstname'] != fn or s['lastname'] != ln or 
+                                     s['program_code'] != pr or s['year'] != yr or s['gender'] != gn)
         
         if changed:
-            dh.student_db.save_data(data)
+            dh.student_db.update({'id': sid, 'firstname': fn, 'lastname': ln, 'program_code': pr, 'year': yr, 'gender': gn})
             self.refresh_student_table() 
             self.update_all_record_counts()
             messagebox.showinfo("Student Updated", "Student updated successfully!")
         self.clear_student_fields()
 
     def delete_student(self):
+        if len(self.student_table.selected) > 1:
+            self.delete_selected_students()
+            return
         sid = self.entry_stud_id.get().strip()
         if not sid:
             return
             
         if messagebox.askyesno("Confirm", f"Delete student {sid}?"):
-            data = [s for s in dh.student_db.load_data() if s['id'] != sid]
-            dh.student_db.save_data(data)
+            dh.student_db.delete(sid)
             self.refresh_student_table()
             self.update_all_record_counts()
             messagebox.showinfo("Student Deleted", "Student deleted successfully!")
             self.clear_student_fields()
 
+    def update_selected_students(self):
+        """give every selected student the program and/or year picked in the form.
+
+        the whole batch is checked once and written as one change, then the
+        table is refreshed once.
+        """
+        students = self.student_table.selected_rows()
+        pr = self.combo_stud_prog.get()
+        yr = self.combo_stud_year.get()
+
+        changes = {}
+        if pr and pr != "Select Program":
+            changes['program_code'] = pr
+        if yr != "Select Year":
+            changes['year'] = yr
+        if not changes:
+            messagebox.showerror("Error", "Pick a program and/or year for the selected students!")
+            return
+
+        if 'program_code' in changes and not dh.program_db.exists(pr):
+            messagebox.showerror("Error", f"Program '{pr}' does not exist! Please select from the dropdown.")
+            return
+
+        records = [{**s, **changes} for s in students if any(s[f] != v for f, v in changes.items())]
+        if records:
+            dh.student_db.update_many(records)
+            self.refresh_student_table()
+            self.update_all_record_counts()
+        messagebox.showinfo("Students Updated", f"Updated {len(records)} of {len(students)} selected students.")
+        self.clear_student_selection()
+
+    def delete_selected_students(self):
+        students = self.student_table.selected_rows()
+        if not students:
+            return
+        if messagebox.askyesno("Confirm", f"Delete {len(students)} selected students?"):
+            count = dh.student_db.delete_many([s['id'] for s in students])
+            self.clear_student_selection()
+            self.refresh_student_table()
+            self.update_all_record_counts()
+            messagebox.showinfo("Students Deleted", f"Deleted {count} students.")
+
+    def clear_student_selection(self):
+        self.student_table.clear_selection()
+        self.clear_student_fields()
+
     def clear_student_fields(self):
         self.entry_stud_id.configure(state="normal")
         self.entry_stud_id.delete(0, 'end')
@@ -892,49 +1506,55 @@ class SISApp(ctk.CTk):
         self.combo_stud_gender.set('Select Gender')
 
     def on_student_select(self, event):
-        selected = self.student_tree.selection()
-        if not selected:
+        selected = self.student_table.selected
+        if len(selected) > 1:
+            # the form now edits the whole selection: update sets program/year, delete removes them
+            self.clear_student_fields()
+            self.stud_selection_label.configure(text=f"{len(selected)} students selected")
+            return
+        self.stud_selection_label.configure(text="")
+        # the selected row may be scrolled out of the window, so read the record itself
+        s = dh.student_db.get(next(iter(selected))) if selected else None
+        if s is None:
             return
-        val = self.student_tree.item(selected[0])['values']
         self.clear_student_fields()
-        self.entry_stud_id.insert(0, val[0])
+        self.entry_stud_id.insert(0, s['id'])
         self.entry_stud_id.configure(state="disabled")
-        self.entry_stud_fname.insert(0, val[1])
-        self.entry_stud_lname.insert(0, val[2])
-        self.combo_stud_prog.set(val[3])
-        self.combo_stud_year.set(str(val[4]))
-        self.combo_stud_gender.set(val[5])
+        self.entry_stud_fname.insert(0, s['firstname'])
+        self.entry_stud_lname.insert(0, s['lastname'])
+        self.combo_stud_prog.set(s['program_code'])
+        self.combo_stud_year.set(s['year'])
+        self.combo_stud_gender.set(s['gender'])
 
     def update_program_dropdown(self):
         programs = dh.program_db.load_data()
         codes = [p['code'] for p in programs]
         self.combo_stud_prog.set_items(codes if codes else ["No Programs"])
 
+    @metrics.instrument
     def refresh_student_table(self):
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        for s in dh.student_db.load_data():
-            self.student_tree.insert("", "end", values=list(s.values()))
+        self.run_in_background('students', dh.student_db.load_data, self.show_students)
+
+    def show_students(self, rows):
+        self.student_table.set_rows(rows)
+        self.update_all_record_counts()
 
+    @metrics.instrument
     def search_student(self, event):
         query = self.entry_search.get().lower()
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        
-        search_results = []
-        for s in dh.student_db.load_data():
-            if any(query in str(v).lower() for v in s.values()):
-                self.student_tree.insert("", "end", values=list(s.values()))
-                search_results.append(s)
-        
-        # update filtered count for search results
-        if query:
-            self.filtered_student_count = len(search_results)
-        else:
-            self.filtered_student_count = None
-        
-        self.update_all_record_counts()
 
+        def done(search_results):
+            # update filtered count for search results
+            if query:
+                self.filtered_student_count = len(search_results)
+            else:
+                self.filtered_student_count = None
+            self.show_students(search_results)
+
+        # each keystroke supersedes the search still running for the previous one
+        self.run_in_background('students', lambda: dh.student_db.search(query), done)
+
+    @metrics.instrument
     def sort_student_table(self, col, reverse):
         # map column headers to database field names
         col_mapping = {
@@ -956,32 +1576,14 @@ class SISApp(ctk.CTk):
         arrow = " ▼" if reverse else " ▲"
         self.student_tree.heading(col, text=col + arrow)
         
+        # sort the whole result set, not just the rows that happen to be rendered
+        # typed keys: years and ids compare as numbers, names ignore case
         if hasattr(self, 'filtered_student_count') and self.filtered_student_count is not None:
-            current_items = []
-            for item in self.student_tree.get_children():
-                values = self.student_tree.item(item)['values']
-                current_items.append({
-                    'id': values[0],
-                    'firstname': values[1],
-                    'lastname': values[2],
-                    'program_code': values[3],
-                    'year': values[4],
-                    'gender': values[5]
-                })
-            
-            current_items.sort(key=lambda x: str(x[db_field]), reverse=reverse)
-            
-            for item in self.student_tree.get_children():
-                self.student_tree.delete(item)
-            for s in current_items:
-                self.student_tree.insert("", "end", values=list(s.values()))
+            current_items = self.student_table.rows
         else:
-            data = dh.student_db.load_data()
-            data.sort(key=lambda x: str(x[db_field]), reverse=reverse)
-            for item in self.student_tree.get_children():
-                self.student_tree.delete(item)
-            for s in data:
-                self.student_tree.insert("", "end", values=list(s.values()))
+            current_items = None
+        work = lambda: dh.student_db.sorted_records(db_field, reverse, subset=current_items)
+        self.run_in_background('students', work, self.show_students)
         
         self.student_tree.heading(col, command=lambda: self.sort_student_table(col, not reverse))
 
@@ -1079,69 +1681,39 @@ class SISApp(ctk.CTk):
         ctk.CTkButton(button_frame, text="Clear All", command=self.clear_all_filters, width=100).pack(side="left", padx=8)
         ctk.CTkButton(button_frame, text="Cancel", command=filter_window.destroy, width=100).pack(side="left", padx=8)
 
+    @metrics.instrument
     def apply_filters(self, filter_window=None):
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
+        # read the checkboxes up front, tk variables can't be touched from the worker
+        active_genders = [g for g in ('male', 'female') if self.filter_vars[g].get()]
 
-        students = dh.student_db.load_data()
-        filtered_students = []
-        
-        # pre-load programs for college lookup
-        programs = dh.program_db.load_data()
-        program_college_map = {prog['code']: prog['college_code'] for prog in programs}
-        
-        for student in students:
-            # gender filter
-            gender_match = True
-            if self.filter_vars['male'].get() or self.filter_vars['female'].get():
-                # only check if at least one gender filter is active
-                gender_match = False
-                if self.filter_vars['male'].get() and student['gender'].lower() == 'male':
-                    gender_match = True
-                if self.filter_vars['female'].get() and student['gender'].lower() == 'female':
-                    gender_match = True
-            
-            # year level filter
-            year_match = True
-            active_year_filters = [year for year in ['1st', '2nd', '3rd', '4th'] 
-                                 if self.filter_vars[f'year_{year}'].get()]
+        year_mapping = {'1st': '1', '2nd': '2', '3rd': '3', '4th': '4'}
+        active_year_filters = [year_mapping[year] for year in ['1st', '2nd', '3rd', '4th'] 
+                               if self.filter_vars[f'year_{year}'].get()]
+
+        active_college_filters = []
+        for college in dh.college_db.load_data():
+            var = self.filter_vars.get(f'college_{college["code"]}')
+            if var is not None and var.get():
+                active_college_filters.append(college['code'])
+
+        def work():
+            # OR within each facet, AND across them, combined as bitsets
+            facets = {}
+            if active_genders:
+                facets['gender'] = active_genders
             if active_year_filters:
-                year_match = False
-                year_mapping = {'1st': '1', '2nd': '2', '3rd': '3', '4th': '4'}
-                for year_filter in active_year_filters:
-                    if student['year'] == year_mapping[year_filter]:
-                        year_match = True
-                        break
-            
-            # college filter
-            college_match = True
-            active_college_filters = []
-            colleges = dh.college_db.load_data()
-            for college in colleges:
-                college_code = college['code']
-                if self.filter_vars[f'college_{college_code}'].get():
-                    active_college_filters.append(college_code)
-            
+                facets['year'] = active_year_filters
             if active_college_filters:
-                college_match = False
-                student_college = program_college_map.get(student['program_code'])
-                if student_college and student_college in active_college_filters:
-                    college_match = True
-            
-            # if all active filters match, add to filtered list
-            if gender_match and year_match and college_match:
-                filtered_students.append(student)
-        
-        # if no filters are active, show all students
-        any_filter_active = any(var.get() for var in self.filter_vars.values())
-        if not any_filter_active:
-            filtered_students = students
-        
-        # populate table with filtered results
-        for student in filtered_students:
-            self.student_tree.insert("", "end", values=list(student.values()))
-        self.filtered_student_count = len(filtered_students)
-        self.update_all_record_counts()
+                # a college selects every student in any of its programs
+                facets['program_code'] = [p['code'] for code in active_college_filters
+                                          for p in dh.program_db.referencing('college_code', code)]
+            return dh.student_db.filter(facets)
+
+        def done(filtered_students):
+            self.filtered_student_count = len(filtered_students)
+            self.show_students(filtered_students)
+
+        self.run_in_background('students', work, done)
 
         if filter_window:
             filter_window.destroy()
@@ -1158,7 +1730,9 @@ class SISApp(ctk.CTk):
 
     def on_tab_change(self):
         tab = self.tabview.get().strip()
-        if tab == "Students":
+        if tab not in self.built_tabs:
+            self.build_tab(tab)
+        elif tab == "Students":
             progs = [p['code'] for p in dh.program_db.load_data()]
             self.combo_stud_prog.set_items(progs if progs else ["No Programs"])
         elif tab == "Programs":
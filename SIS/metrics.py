@@ -0,0 +1,133 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+# metrics are off unless SIS_METRICS is set (to 1, or to the file to write) or sis.ini says so
+CONFIG_FILE = 'sis.ini'
+METRICS_FILE = 'sis-metrics.jsonl'
+# the file is rolled over to <file>.1 once it grows past this
+MAX_BYTES = 1_000_000
+# buffered events are written out after this many, and at exit
+FLUSH_EVERY = 50
+
+_lock = threading.Lock()
+_stats = {}    # name -> [calls, total seconds, max seconds, rows, bytes read, bytes written]
+_pending = []
+_config = None
+
+def _load_config():
+    global _config
+    if _config is None:
+        enabled = os.environ.get('SIS_METRICS', '')
+        path = METRICS_FILE
+        if enabled and enabled.lower() not in ('0', '1', 'yes', 'true', 'on', 'no', 'false', 'off'):
+            path = enabled
+        elif not enabled and os.path.exists(CONFIG_FILE):
+            import configparser
+            parser = configparser.ConfigParser()
+            parser.read(CONFIG_FILE)
+            if parser.has_section('metrics'):
+                enabled = parser['metrics'].get('enabled', '')
+                path = parser['metrics'].get('file', path)
+        on = enabled.lower() not in ('', '0', 'no', 'false', 'off')
+        # resolved now, the app may change directory later
+        _config = (on, os.path.abspath(path))
+    return _config
+
+def enabled():
+    return _load_config()[0]
+
+def metrics_path():
+    return _load_config()[1]
+
+def record(name, seconds, rows=None, bytes_read=0, bytes_written=0):
+    """Add one call to the totals for name and queue it for the metrics file."""
+    if not enabled():
+        return
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = [0, 0.0, 0.0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        stats[3] += rows or 0
+        stats[4] += bytes_read
+        stats[5] += bytes_written
+        event = {'time': round(time.time(), 3), 'name': name, 'ms': round(seconds * 1000, 3)}
+        if rows is not None:
+            event['rows'] = rows
+        if bytes_read:
+            event['bytes_read'] = bytes_read
+        if bytes_written:
+            event['bytes_written'] = bytes_written
+        _pending.append(event)
+        if len(_pending) >= FLUSH_EVERY:
+            _flush_locked()
+
+def _flush_locked():
+    if not _pending:
+        return
+    path = metrics_path()
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > MAX_BYTES:
+            os.replace(path, path + '.1')
+        with open(path, mode = 'a') as f:
+            f.writelines(json.dumps(event) + '\n' for event in _pending)
+    except OSError:
+        # metrics must never break the app
+        pass
+    _pending.clear()
+
+def flush():
+    with _lock:
+        _flush_locked()
+
+atexit.register(flush)
+
+def snapshot():
+    """Return {name: dict of totals} for everything recorded so far."""
+    with _lock:
+        return {name: {'calls': calls, 'total_ms': total * 1000, 'avg_ms': total * 1000 / calls,
+                       'max_ms': longest * 1000, 'rows': rows, 'bytes_read': read, 'bytes_written': written}
+                for name, (calls, total, longest, rows, read, written) in _stats.items()}
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def instrument(fn):
+    """Decorator recording calls, wall time, rows returned and bytes moved.
+
+    Does nothing (returns fn itself) unless metrics are enabled when the
+    decorated module is imported. Calls are named <owner>.<function>, where
+    owner is the instance's metrics_name (e.g. the table) or its class name.
+    Rows are counted when the call returns or is given a list, and bytes
+    when the instance keeps bytes_read/bytes_written counters.
+    """
+    if not enabled():
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        read = getattr(self, 'bytes_read', 0)
+        written = getattr(self, 'bytes_written', 0)
+        start = time.perf_counter()
+        result = fn(self, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+        owner = getattr(self, 'metrics_name', type(self).__name__)
+        # rows returned, or rows handed in for writes like save_data(list)
+        if isinstance(result, list):
+            rows = len(result)
+        elif args and isinstance(args[0], list):
+            rows = len(args[0])
+        else:
+            rows = None
+        record(f"{owner}.{fn.__name__}", elapsed, rows=rows,
+               bytes_read=getattr(self, 'bytes_read', 0) - read,
+               bytes_written=getattr(self, 'bytes_written', 0) - written)
+        return result
+    return wrapper
@@ -0,0 +1,49 @@
+import sys
+from bisect import bisect_left
+
+class PrefixIndex:
+    """Case-insensitive matching of typed text against a list of choices.
+
+    Each choice is casefolded once, up front, and the folded keys are kept
+    sorted so the choices starting with the text are found by bisection.
+    Choices that only contain the text somewhere later are found by a scan
+    of the precomputed keys, and only once the prefix matches run out.
+    """
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.keys = [str(item).casefold() for item in self.items]
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[i] for i in order]
+        self._sorted_positions = order
+
+    def __len__(self):
+        return len(self.items)
+
+    def _prefix_range(self, text):
+        lo = bisect_left(self._sorted_keys, text)
+        # the first key past every string starting with text is text with its
+        # last character bumped by one (characters that can't be bumped are dropped)
+        stripped = text.rstrip(chr(sys.maxunicode))
+        if not stripped:
+            return lo, len(self._sorted_keys)
+        upper = stripped[:-1] + chr(ord(stripped[-1]) + 1)
+        return lo, bisect_left(self._sorted_keys, upper, lo)
+
+    def matches(self, text):
+        """Yield the choices matching text, lazily.
+
+        Choices starting with text come first, alphabetically; then those
+        containing it elsewhere, in list order. An empty text yields every
+        choice in list order.
+        """
+        text = text.casefold()
+        if not text:
+            yield from self.items
+            return
+        lo, hi = self._prefix_range(text)
+        items = self.items
+        for i in self._sorted_positions[lo:hi]:
+            yield items[i]
+        for item, key in zip(items, self.keys):
+            if text in key and not key.startswith(text):
+                yield item
@@ -0,0 +1,84 @@
+import os
+import struct
+import sys
+import threading
+from array import array
+
+MAGIC = b'SISIDX01'
+# magic, row count, source csv mtime_ns, source csv size
+HEADER = struct.Struct('<8sQqQ')
+OFFSET = struct.Struct('<Q')
+
+class RowIndex:
+    """Where each row of a CSV file starts, kept next to it in <file>.idx.
+
+    Layout: a fixed header carrying the row count and the mtime/size of the
+    CSV it was made from, then one 8-byte byte offset per data row plus one
+    for the end of the last row. Offsets are read on demand, so opening the
+    index costs the same for any size of file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            magic, self.count, mtime_ns, size = HEADER.unpack(self._file.read(HEADER.size))
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a row index file")
+        self.stamp = (mtime_ns, size)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def offset(self, i):
+        """Return where row i starts in the CSV (i == count gives the end of the data)."""
+        self._file.seek(HEADER.size + i * OFFSET.size)
+        return OFFSET.unpack(self._file.read(OFFSET.size))[0]
+
+
+def scan_rows(csv_path):
+    """Return the offsets of the data rows of csv_path, plus the end of the last one.
+
+    A line break only ends a row outside quotes, so quoted fields holding
+    newlines are handled; blank lines are skipped, as csv.DictReader does.
+    """
+    offsets = array('Q')
+    position = 0
+    quotes = 0
+    header = True
+    with open(csv_path, 'rb') as f:
+        for line in f:
+            if not quotes:
+                # at the start of a row
+                if header or not line.strip(b'\r\n'):
+                    pass
+                else:
+                    offsets.append(position)
+            quotes += line.count(b'"')
+            position += len(line)
+            if quotes % 2 == 0:
+                quotes = 0
+                header = False
+    offsets.append(position)
+    return offsets
+
+def write_index(path, stamp, offsets):
+    """Write offsets (from scan_rows), stamped with the CSV's (mtime_ns, size)."""
+    mtime_ns, size = stamp
+    # unique per writer, two processes may rebuild the same index
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if sys.byteorder != 'little':
+        offsets = array('Q', offsets)
+        offsets.byteswap()
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(offsets) - 1, mtime_ns, size))
+        f.write(offsets.tobytes())
+    os.replace(tmp, path)
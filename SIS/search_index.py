@@ -0,0 +1,205 @@
+from array import array
+from bisect import bisect_left
+
+GRAM = 3
+# how many one and two character queries keep their matching rows
+SHORT_CACHE = 64
+
+class TrigramIndex:
+    """Substring search index over the lowercased fields of a table.
+
+    Every record gets an integer row id, and every distinct trigram in its
+    lowercased fields maps to an array of the row ids containing it. A query
+    of three or more characters only has to verify the rows listed under its
+    rarest trigram. Shorter queries scan the precomputed lowercased text the
+    first time, and their matching rows are kept up to date from then on.
+
+    Updates and deletes leave dead row ids behind in the posting arrays; the
+    index rebuilds itself once more than half of its row ids are dead.
+    """
+    def __init__(self, key, fields, records=()):
+        self.key = key
+        self.fields = fields
+        self.clear()
+        for i, record in enumerate(records):
+            self._add(record, i)
+        self._built = len(self.records)
+
+    def clear(self):
+        self.postings = {}
+        self.short = {}     # one or two character query -> rows containing it
+        self.records = []   # row id -> record, None once removed
+        self.texts = []     # row id -> lowercased fields joined by \0
+        self.ranks = []     # row id -> position in the table, for ordering results
+        self.ids = {}       # key -> live row id
+        self.dead = 0
+        self._top = 0
+        # rows below this were added in table order, see _table_order
+        self._built = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _text(self, record):
+        # \0 keeps a query from matching across two fields
+        return '\0'.join(str(record[f]).lower() for f in self.fields)
+
+    def _add(self, record, rank):
+        row = len(self.records)
+        text = self._text(record)
+        self.records.append(record)
+        self.texts.append(text)
+        self.ranks.append(rank)
+        self.ids[record[self.key]] = row
+
+        grams = set()
+        for part in text.split('\0'):
+            grams.update(part[i:i + GRAM] for i in range(len(part) - GRAM + 1))
+
+        postings = self.postings
+        for gram in grams:
+            rows = postings.get(gram)
+            if rows is None:
+                rows = postings[gram] = array('i')
+            rows.append(row)
+        for query, rows in self.short.items():
+            if query in text:
+                rows.append(row)
+
+    def add(self, record):
+        """Index a record that was inserted at the top of the table."""
+        self._remove(record[self.key])
+        self._top -= 1
+        self._add(record, self._top)
+        self._maybe_rebuild()
+
+    def update(self, record):
+        """Re-index a record in place, keeping its position in the table."""
+        row = self.ids.get(record[self.key])
+        if row is None:
+            self.add(record)
+            return
+        rank = self.ranks[row]
+        self._remove(record[self.key])
+        self._add(record, rank)
+        self._maybe_rebuild()
+
+    def remove(self, key):
+        self._remove(key)
+        self._maybe_rebuild()
+
+    def sync(self, records):
+        """Bring the index in line with records, the whole table in order, e.g. after a reload.
+
+        Only records whose text changed are re-indexed, which costs a small
+        part of building a new index.
+        """
+        ids, texts, ranks = self.ids, self.texts, self.ranks
+        gone = set(ids)
+        for rank, record in enumerate(records):
+            key = record[self.key]
+            gone.discard(key)
+            row = ids.get(key)
+            if row is not None and texts[row] == self._text(record):
+                self.records[row] = record
+                ranks[row] = rank
+            else:
+                self._remove(key)
+                self._add(record, rank)
+        for key in gone:
+            self._remove(key)
+        self._top = 0
+        # if the reload reordered the table, the rows from the build are no longer in order
+        last = None
+        for row in range(self._built):
+            if self.records[row] is not None:
+                if last is not None and ranks[row] < last:
+                    self._built = 0
+                    break
+                last = ranks[row]
+        self._maybe_rebuild()
+
+    def _remove(self, key):
+        row = self.ids.pop(key, None)
+        if row is None:
+            return
+        self.records[row] = None
+        self.texts[row] = ''
+        self.dead += 1
+
+    def _maybe_rebuild(self):
+        if self.dead > len(self.records) // 2:
+            self._rebuild()
+
+    def _rebuild(self):
+        live = sorted((self.ranks[row], row) for row in self.ids.values())
+        records = [self.records[row] for _, row in live]
+        self.clear()
+        for i, record in enumerate(records):
+            self._add(record, i)
+        self._built = len(self.records)
+
+    def search(self, query):
+        """Return the records with query in any field, in table order."""
+        query = query.lower()
+        texts = self.texts
+        if not query:
+            rows = [row for row, record in enumerate(self.records) if record is not None]
+        elif len(query) < GRAM:
+            rows = self._short_rows(query)
+            # removed rows stay listed, with an empty text
+            rows = [row for row in rows if texts[row]] if self.dead else list(rows)
+        else:
+            candidates = None
+            for gram in {query[i:i + GRAM] for i in range(len(query) - GRAM + 1)}:
+                rows = self.postings.get(gram)
+                if rows is None:
+                    return []
+                if candidates is None or len(rows) < len(candidates):
+                    candidates = rows
+            rows = [row for row in candidates if query in texts[row]]
+
+        return list(map(self.records.__getitem__, self._table_order(rows)))
+
+    def _short_rows(self, query):
+        """Return the rows containing a one or two character query.
+
+        Too short for trigrams, so the first search scans the texts (a two
+        character one only those holding its first character, if known) and
+        the rows are kept, and added to as rows are indexed, for next time.
+        """
+        rows = self.short.get(query)
+        if rows is None:
+            texts = self.texts
+            within = self.short.get(query[0]) if len(query) > 1 else None
+            if within is None:
+                rows = array('i', (row for row, text in enumerate(texts) if query in text))
+            else:
+                rows = array('i', (row for row in within if query in texts[row]))
+            if len(self.short) >= SHORT_CACHE:
+                self.short.clear()
+            self.short[query] = rows
+        return rows
+
+    def _table_order(self, rows):
+        """Put rows (ascending row ids) in table order.
+
+        Rows below _built were added in table order and stay in it, so only
+        the few added or re-indexed since need placing among them.
+        """
+        split = bisect_left(rows, self._built)
+        if split == len(rows):
+            return rows
+        ranks = self.ranks
+        if not split:
+            return sorted(rows, key=ranks.__getitem__)
+        base = rows[:split]
+        ordered = []
+        start = 0
+        for row in sorted(rows[split:], key=ranks.__getitem__):
+            pos = bisect_left(base, ranks[row], lo=start, key=ranks.__getitem__)
+            ordered.extend(base[start:pos])
+            ordered.append(row)
+            start = pos
+        ordered.extend(base[start:])
+        return ordered
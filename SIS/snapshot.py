@@ -0,0 +1,125 @@
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'SISSNAP1'
+# magic, row count, source csv mtime_ns, source csv size, length of the field list
+HEADER = struct.Struct('<8sQqQI')
+OFFSET = struct.Struct('<Q')
+
+FIELD_SEP = '\x1f'
+ROW_SEP = '\x1e'
+
+class Snapshot:
+    """A memory-mapped binary copy of a CSV file.
+
+    Layout: a fixed header carrying the row count and the mtime/size of the
+    CSV it was made from, the field names, one 8-byte offset per row, then
+    the rows as UTF-8 text with fields split by \\x1f and rows ended by \\x1e.
+    Reading it back is a single decode and split instead of a CSV parse, and
+    the offsets allow jumping straight to any row.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.count, mtime_ns, size, fields_len = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a snapshot file")
+            start = HEADER.size
+            self.fieldnames = self._map[start:start + fields_len].decode('utf-8').split(FIELD_SEP)
+            self.stamp = (mtime_ns, size)
+            self._offsets = start + fields_len
+            self._rows = self._offsets + (self.count + 1) * OFFSET.size
+        except (struct.error, UnicodeDecodeError):
+            self._map.close()
+            raise ValueError(f"{path} is not a snapshot file")
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _offset(self, i):
+        return self._rows + OFFSET.unpack_from(self._map, self._offsets + i * OFFSET.size)[0]
+
+    def rows(self, start=0, stop=None):
+        """Return rows start..stop as lists of strings."""
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return []
+        text = self._map[self._offset(start):self._offset(stop)].decode('utf-8')
+        return [row.split(FIELD_SEP) for row in text.split(ROW_SEP)[:-1]]
+
+    def records(self, start=0, stop=None):
+        fieldnames = self.fieldnames
+        return [dict(zip(fieldnames, row)) for row in self.rows(start, stop)]
+
+
+def csv_stamp(csv_path):
+    st = os.stat(csv_path)
+    return (st.st_mtime_ns, st.st_size)
+
+def read_snapshot(path, csv_path, fieldnames, stop=None):
+    """Return the snapshot's records (up to stop) if it is current for csv_path, else None."""
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    with snap:
+        if snap.stamp != csv_stamp(csv_path) or snap.fieldnames != list(fieldnames):
+            return None
+        return snap.records(0, stop)
+
+def snapshot_count(path, csv_path, fieldnames):
+    """Return the snapshot's row count if it is current for csv_path, else None."""
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    with snap:
+        if snap.stamp != csv_stamp(csv_path) or snap.fieldnames != list(fieldnames):
+            return None
+        return snap.count
+
+def write_snapshot(path, stamp, fieldnames, records):
+    """Write a snapshot of records, stamped with the (mtime_ns, size) of the
+    CSV they were read from or written to.
+
+    Returns False without writing anything if a value can't be stored
+    (missing fields, or text containing the separator characters).
+    """
+    try:
+        rows = [FIELD_SEP.join(r[f] for f in fieldnames) + ROW_SEP for r in records]
+    except (TypeError, KeyError):
+        return False
+    # a separator inside a value would show up as an extra one somewhere
+    text = ''.join(rows)
+    if text.count(ROW_SEP) != len(rows) or text.count(FIELD_SEP) != (len(fieldnames) - 1) * len(rows):
+        return False
+
+    encoded = [row.encode('utf-8') for row in rows]
+    offsets = bytearray(OFFSET.size * (len(encoded) + 1))
+    position = 0
+    for i, row in enumerate(encoded):
+        OFFSET.pack_into(offsets, i * OFFSET.size, position)
+        position += len(row)
+    OFFSET.pack_into(offsets, len(encoded) * OFFSET.size, position)
+
+    field_bytes = FIELD_SEP.join(fieldnames).encode('utf-8')
+    mtime_ns, size = stamp
+    # unique per writer, a reader refreshing the snapshot may race a compaction
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded), mtime_ns, size, len(field_bytes)))
+        f.write(field_bytes)
+        f.write(offsets)
+        f.writelines(encoded)
+    os.replace(tmp, path)
+    return True
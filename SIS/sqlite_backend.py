@@ -0,0 +1,317 @@
+import csv
+import os
+import sqlite3
+import threading
+
+import metrics
+from storage import ChangeLog, Changes, Storage, merge_records
+
+def _text_function(fold):
+    return lambda value: None if value is None else fold(str(value))
+
+class SQLiteHandler(Storage):
+    """Stores one table in an SQLite database, behind the same interface as DataHandler.
+
+    Each table gets a unique index on its primary key and a plain index on
+    every foreign key field. Search, filter, sort and count are pushed down
+    into SQL with bound parameters, so sqlite3's statement cache reuses the
+    prepared statements, and every write runs in its own transaction. Table
+    order (newest first) is rowid descending.
+
+    When a table is first created, the rows of the CSV file it replaces are
+    copied in, so switching backends keeps the data. That happens once per
+    table (recorded in sis_seeded), deleting every row doesn't bring them back.
+    """
+    def __init__(self, database, filename, fieldnames, foreign_keys=(), sort_keys=None, sort_sql=None):
+        self.database = database
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.key = fieldnames[0]
+        self.foreign_keys = tuple(foreign_keys)
+        self.sort_keys = dict(sort_keys or {})
+        # field -> SQL expression used to order by that field
+        self.sort_sql = dict(sort_sql or {})
+        self.table = os.path.splitext(os.path.basename(filename))[0]
+        self.metrics_name = self.table
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        # sqlite's own lower() only folds ascii; these match what DataHandler does in python
+        self._conn.create_function('py_lower', 1, _text_function(str.lower), deterministic=True)
+        self._conn.create_function('py_casefold', 1, _text_function(str.casefold), deterministic=True)
+        self._records = None
+        self._version = None
+        self._writes = 0
+        # keys our own writes touched since the last load, None once we rewrote the whole table
+        self._own = set()
+        # row count kept up to date by our writes; recounted when another connection commits
+        self._total = None
+        self._total_version = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # keys other connections changed since the last refresh(); None until someone asks
+        self._unseen = None
+
+        self._columns_sql = ', '.join(f'"{f}"' for f in self.fieldnames)
+        with self._lock, self._conn:
+            columns = ', '.join(f'"{f}" TEXT NOT NULL DEFAULT \'\'' for f in self.fieldnames)
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({columns})')
+            self._conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{self.table}_{self.key}" '
+                               f'ON "{self.table}" ("{self.key}")')
+            for field in self.foreign_keys:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS "{self.table}_{field}" '
+                                   f'ON "{self.table}" ("{field}")')
+            # the tables that have had their CSV copied in, so emptying one later doesn't refill it
+            self._conn.execute('CREATE TABLE IF NOT EXISTS "sis_seeded" ("name" TEXT PRIMARY KEY)')
+            first = self._conn.execute('INSERT OR IGNORE INTO "sis_seeded" VALUES (?)', (self.table,)).rowcount
+            # a table filled before the marker existed counts as seeded
+            empty = self._conn.execute(f'SELECT 1 FROM "{self.table}" LIMIT 1').fetchone() is None
+            if first and empty and os.path.exists(filename):
+                with open(filename, mode = 'r', newline='') as f:
+                    # same transaction as the marker, so a crash leaves neither
+                    self._insert_all(list(csv.DictReader(f)))
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            return [dict(zip(self.fieldnames, row)) for row in cursor]
+
+    def _select(self, where='', order=None):
+        order = order or 'rowid DESC'
+        return f'SELECT {self._columns_sql} FROM "{self.table}" {where} ORDER BY {order}'
+
+    def _values(self, record):
+        return [str(record.get(f) or '') for f in self.fieldnames]
+
+    def _wrote(self, keys=None):
+        """Note a write of ours, to these keys or (None) the whole table."""
+        self._writes += 1
+        if keys is None:
+            self._own = None
+        elif self._own is not None:
+            self._own.update(keys)
+
+    # LOADING AND SAVING
+
+    @metrics.instrument
+    def load_data(self):
+        with self._lock:
+            # data_version moves when another connection commits; _writes covers ours
+            version = (self._conn.execute('PRAGMA data_version').fetchone()[0], self._writes)
+            if self._records is not None and version == self._version:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+                records = self._rows(self._select())
+                if self._records is not None:
+                    # keep the records nobody changed; report what other connections did
+                    records, changes = merge_records(self.key, self._records, records)
+                    own = self._own
+                    if self._unseen is not None and own is not None:
+                        key = self.key
+                        self._unseen.note_changes(key, Changes([r for r in changes.added if r[key] not in own],
+                                                               [r for r in changes.updated if r[key] not in own],
+                                                               changes.removed - own))
+                self._records = records
+                self._version = version
+                self._own = set()
+            return list(self._records)
+
+    def changed(self):
+        if self._unseen is None:
+            self._unseen = ChangeLog()
+        elif self._unseen:
+            return True
+        # polled from the gui thread, don't wait for a worker that is busy loading
+        if self._records is None or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0] != self._version[0]
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        with self._lock:
+            if self._unseen is None:
+                self._unseen = ChangeLog()
+            if self._records is None:
+                return None
+            self.load_data()
+            if not self._unseen:
+                return None
+            changes = self._unseen.changes(self.key, self._records)
+            self._unseen = ChangeLog()
+            return changes
+
+    def head(self, n):
+        with self._lock:
+            if self._records is not None:
+                return self._records[:n]
+        return self._rows(self._select() + ' LIMIT ?', (n,))
+
+    def iter_records(self, batch=1000):
+        # walk rowids in batches rather than holding a cursor open across yields
+        sql = f'SELECT rowid, {self._columns_sql} FROM "{self.table}" {{}} ORDER BY rowid DESC LIMIT ?'
+        last = None
+        while True:
+            with self._lock:
+                if last is None:
+                    rows = self._conn.execute(sql.format(''), (batch,)).fetchall()
+                else:
+                    rows = self._conn.execute(sql.format('WHERE rowid < ?'), (last, batch)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for row in rows:
+                yield dict(zip(self.fieldnames, row[1:]))
+
+    def load_page(self, offset, limit):
+        if offset < 0 or limit < 0:
+            # sqlite would take a negative limit as no limit at all
+            raise ValueError("offset and limit must be non-negative")
+        return self._rows(self._select() + ' LIMIT ? OFFSET ?', (limit, offset))
+
+    def _insert_all(self, data_list):
+        placeholders = ', '.join('?' for _ in self.fieldnames)
+        # oldest first, so rowid order matches the list order read back
+        self._conn.executemany(f'INSERT OR REPLACE INTO "{self.table}" ({self._columns_sql}) VALUES ({placeholders})',
+                               (self._values(r) for r in reversed(data_list)))
+
+    def _replace_all(self, data_list):
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM "{self.table}"')
+            self._insert_all(data_list)
+            self._wrote()
+            self._total = None
+
+    @metrics.instrument
+    def save_data(self, data_list):
+        self._replace_all(data_list)
+
+    def insert(self, record):
+        placeholders = ', '.join('?' for _ in self.fieldnames)
+        values = self._values(record)
+        with self._lock, self._conn:
+            replaced = self._conn.execute(f'SELECT 1 FROM "{self.table}" WHERE "{self.key}" = ?', values[:1]).fetchone()
+            self._conn.execute(f'INSERT OR REPLACE INTO "{self.table}" ({self._columns_sql}) VALUES ({placeholders})',
+                               values)
+            self._wrote(values[:1])
+            if self._total is not None and replaced is None:
+                self._total += 1
+
+    def insert_many(self, records):
+        placeholders = ', '.join('?' for _ in self.fieldnames)
+        rows = [self._values(r) for r in records]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(f'INSERT OR REPLACE INTO "{self.table}" ({self._columns_sql}) VALUES ({placeholders})',
+                                            rows)
+            self._wrote(values[0] for values in rows)
+            self._total = None
+            return cursor.rowcount
+
+    def update(self, record):
+        assignments = ', '.join(f'"{f}" = ?' for f in self.fieldnames[1:])
+        values = self._values(record)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f'UPDATE "{self.table}" SET {assignments} WHERE "{self.key}" = ?',
+                                        values[1:] + values[:1])
+            self._wrote(values[:1])
+            return cursor.rowcount > 0
+
+    def update_many(self, records):
+        assignments = ', '.join(f'"{f}" = ?' for f in self.fieldnames[1:])
+        rows = [values[1:] + values[:1] for values in map(self._values, records)]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(f'UPDATE "{self.table}" SET {assignments} WHERE "{self.key}" = ?', rows)
+            self._wrote(row[-1] for row in rows)
+            return cursor.rowcount
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(f'DELETE FROM "{self.table}" WHERE "{self.key}" = ?',
+                                            ((key,) for key in keys))
+            self._wrote(keys)
+            if self._total is not None:
+                self._total -= cursor.rowcount
+            return cursor.rowcount
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f'DELETE FROM "{self.table}" WHERE "{self.key}" = ?', (key,))
+            self._wrote([key])
+            if self._total is not None:
+                self._total -= cursor.rowcount
+            return cursor.rowcount > 0
+
+    def replace_value(self, field, old, new):
+        with self._lock, self._conn:
+            keys = [row[0] for row in self._conn.execute(
+                f'SELECT "{self.key}" FROM "{self.table}" WHERE "{field}" = ?', (old,))]
+            cursor = self._conn.execute(f'UPDATE "{self.table}" SET "{field}" = ? WHERE "{field}" = ?', (new, old))
+            self._wrote(keys + [new] if field == self.key else keys)
+            return cursor.rowcount
+
+    # QUERIES
+
+    def get(self, key):
+        rows = self._rows(self._select(f'WHERE "{self.key}" = ?'), (key,))
+        return rows[0] if rows else None
+
+    def referencing(self, field, value):
+        return self._rows(self._select(f'WHERE "{field}" = ?'), (value,))
+
+    def has_references(self, field, value):
+        with self._lock:
+            row = self._conn.execute(f'SELECT 1 FROM "{self.table}" WHERE "{field}" = ? LIMIT 1', (value,)).fetchone()
+        return row is not None
+
+    def search(self, query):
+        if not query:
+            return self.load_data()
+        # one call into python per row; char(0) keeps a match from spanning two fields
+        text = ' || char(0) || '.join(f'"{f}"' for f in self.fieldnames)
+        return self._rows(self._select(f'WHERE instr(py_lower({text}), ?) > 0'), [query.lower()])
+
+    def _facets_sql(self, facets):
+        clauses = []
+        params = []
+        for field, values in facets.items():
+            values = [str(v).casefold() for v in values]
+            if not values:
+                clauses.append('0')
+                continue
+            clauses.append(f'py_casefold("{field}") IN ({", ".join("?" for _ in values)})')
+            params.extend(values)
+        return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def filter(self, facets):
+        where, params = self._facets_sql(facets)
+        return self._rows(self._select(where), params)
+
+    def count(self, facets=None):
+        if not facets:
+            with self._lock:
+                version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+                if self._total is None or version != self._total_version:
+                    self._total = self._conn.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+                    self._total_version = version
+                return self._total
+        where, params = self._facets_sql(facets)
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM "{self.table}" {where}', params).fetchone()[0]
+
+    def sort_key(self, field):
+        keyfn = self.sort_keys.get(field, lambda value: str(value).casefold())
+        return lambda record: keyfn(record[field])
+
+    def sorted_records(self, field, reverse=False, subset=None):
+        if subset is not None:
+            # the subset came out of an earlier query; sort it with the same typed keys
+            return sorted(subset, key=self.sort_key(field), reverse=reverse)
+        expression = self.sort_sql.get(field, f'py_casefold("{field}")')
+        direction, ties = ('DESC', 'ASC') if reverse else ('ASC', 'DESC')
+        return self._rows(self._select(order=f'{expression} {direction}, rowid {ties}'))
+
+    def cache_stats(self):
+        return {'hits': self.cache_hits, 'misses': self.cache_misses}
@@ -0,0 +1,192 @@
+from collections import namedtuple
+
+# what another process changed in a table: new and edited records, and deleted keys
+Changes = namedtuple('Changes', 'added updated removed')
+
+class Storage:
+    """Interface shared by the table storage backends.
+
+    A table is a list of records (dicts keyed by fieldnames) whose first
+    field is the primary key. The GUI and scripts only talk to tables
+    through these methods, so data_handler.open_table can hand out a CSV or
+    an SQLite backed table depending on the configuration.
+    """
+    fieldnames = ()
+    key = None
+
+    def load_data(self):
+        """Return all records, newest first."""
+        raise NotImplementedError
+
+    def head(self, n):
+        """Return the first n records, ideally without loading the rest."""
+        return self.load_data()[:n]
+
+    def iter_records(self):
+        """Yield every record in table order, ideally without loading them all."""
+        return iter(self.load_data())
+
+    def load_page(self, offset, limit):
+        """Return up to limit records starting at position offset; both must be non-negative."""
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must be non-negative")
+        return self.load_data()[offset:offset + limit]
+
+    def save_data(self, data_list):
+        """Replace the whole table with data_list."""
+        raise NotImplementedError
+
+    def insert(self, record):
+        raise NotImplementedError
+
+    def insert_many(self, records):
+        """Insert records as if insert() were called for each in turn.
+
+        Backends override this to commit them all in one write. Returns the
+        number of records inserted.
+        """
+        count = 0
+        for record in records:
+            self.insert(record)
+            count += 1
+        return count
+
+    def update(self, record):
+        """Replace the record with record's key; False if there is none."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove the record with this key; False if there is none."""
+        raise NotImplementedError
+
+    def update_many(self, records):
+        """Update several records as one change: all of them are written or none.
+
+        Returns the number of records found and updated. The default is for
+        backends without transactions; the real ones override it.
+        """
+        return sum(1 for record in records if self.update(record))
+
+    def delete_many(self, keys):
+        """Delete several records as one change; returns how many existed."""
+        return sum(1 for key in keys if self.delete(key))
+
+    def replace_value(self, field, old, new):
+        """Set field to new on every record where it is old, in one write; returns how many changed."""
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def referencing(self, field, value):
+        """Return the records whose field equals value."""
+        raise NotImplementedError
+
+    def has_references(self, field, value):
+        return bool(self.referencing(field, value))
+
+    def search(self, query):
+        """Return the records with query as a substring of any field, ignoring case."""
+        raise NotImplementedError
+
+    def build_search_index(self):
+        """Prepare whatever search() needs ahead of the first query."""
+
+    def filter(self, facets):
+        """Return the records whose field matches any of the values given for it, for every field in facets."""
+        raise NotImplementedError
+
+    def sorted_records(self, field, reverse=False, subset=None):
+        raise NotImplementedError
+
+    def count(self, facets=None):
+        raise NotImplementedError
+
+    def columns(self):
+        """Return a columnar.ColumnarTable of the records, or None if unsupported."""
+        return None
+
+    def changed(self):
+        """Whether another process has written to the table since it was last read."""
+        return False
+
+    def refresh(self):
+        """Catch up with writes made by other processes.
+
+        Returns Changes, or None when nothing changed. Records that stayed the
+        same keep their identity and edited ones are updated in place. Query
+        results may be copies rather than the cached records (SQLite builds
+        fresh ones), so a list of records held elsewhere (e.g. by the GUI)
+        is brought up to date by dropping the removed keys, putting in the
+        added records and swapping in the updated ones by key.
+        """
+        return None
+
+    def cache_stats(self):
+        return {}
+
+
+def merge_records(key, old, new):
+    """Return (records, Changes) for a fresh read of a table that was holding old.
+
+    records is new with unchanged and edited records swapped for their old
+    dicts (edited ones updated in place), so they keep their identity.
+    """
+    old_by_key = {r[key]: r for r in old}
+    records = []
+    added, updated = [], []
+    for record in new:
+        current = old_by_key.pop(record[key], None)
+        if current is None:
+            added.append(record)
+        else:
+            if current != record:
+                current.update(record)
+                updated.append(current)
+            record = current
+        records.append(record)
+    return records, Changes(added, updated, set(old_by_key))
+
+
+class ChangeLog:
+    """Keys changed by other processes since the last Storage.refresh()."""
+    def __init__(self):
+        self.added = set()
+        self.updated = set()
+        self.removed = set()
+
+    def __bool__(self):
+        return bool(self.added or self.updated or self.removed)
+
+    def note(self, kind, key):
+        if kind == 'removed':
+            self.added.discard(key)
+            self.updated.discard(key)
+            self.removed.add(key)
+        elif kind == 'added':
+            self.added.add(key)
+        elif key not in self.added:
+            self.updated.add(key)
+
+    def note_changes(self, key, changes):
+        for record in changes.added:
+            self.note('added', record[key])
+        for record in changes.updated:
+            self.note('updated', record[key])
+        for k in changes.removed:
+            self.note('removed', k)
+
+    def changes(self, key, records):
+        """Return Changes with the current records for the noted keys, in table order."""
+        added, updated = [], []
+        if self.added or self.updated:
+            for record in records:
+                k = record[key]
+                if k in self.added:
+                    added.append(record)
+                elif k in self.updated:
+                    updated.append(record)
+        return Changes(added, updated, set(self.removed))
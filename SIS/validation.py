@@ -0,0 +1,8 @@
+import re
+
+# kept apart from data_handler, which opens the tables when imported, so
+# processes that only validate rows (the bulk import workers) can use it
+
+def validate_student_id(student_id):
+    pattern = r"^\d{4}-\d{4}$"
+    return bool(re.match(pattern, student_id))